@@ -0,0 +1,104 @@
+import argparse
+import json
+from sqlalchemy import select, update, bindparam, case, func
+import models
+import changelog
+from ingest import DELTA_COLUMNS
+
+_player_table = models.Player.__table__
+
+_set_totals = (
+    update(_player_table)
+    .where(_player_table.c.id == bindparam("player_id"))
+    .values({c: bindparam(f"v_{c}") for c in DELTA_COLUMNS})
+)
+
+
+def aggregates_query(*group_by):
+    mp = models.MatchPlayer
+    m = models.Match
+    winner = case((m.score_blue > m.score_red, "blue"), else_="red")
+    is_blue = mp.team == "blue"
+    keys = [mp.player_id.label("player_id"), *group_by]
+    return (
+        select(
+            *keys,
+            func.count().label("matches"),
+            func.sum(case((mp.team == winner, 1), else_=0)).label("wins"),
+            func.sum(case((mp.team == winner, 0), else_=1)).label("losses"),
+            func.sum(case((is_blue, m.score_blue), else_=m.score_red)).label("roundsWon"),
+            func.sum(case((is_blue, m.score_red), else_=m.score_blue)).label("roundsLost"),
+            func.sum(mp.kills).label("kills"),
+            func.sum(mp.deaths).label("deaths"),
+            func.sum(mp.assists).label("assists"),
+        )
+        .join(m, m.id == mp.match_id)
+        .group_by(*keys)
+    )
+
+
+def find_drift(db):
+    expected = aggregates_query().subquery()
+    p = models.Player
+    rows = db.execute(
+        select(
+            p.id,
+            p.name,
+            *[getattr(p, c) for c in DELTA_COLUMNS],
+            *[func.coalesce(expected.c[c], 0) for c in DELTA_COLUMNS],
+        ).outerjoin(expected, expected.c.player_id == p.id)
+    ).all()
+
+    n = len(DELTA_COLUMNS)
+    drift = []
+    for row in rows:
+        stored = [v or 0 for v in row[2:2 + n]]
+        actual = list(row[2 + n:])
+        if stored != actual:
+            drift.append({
+                "player_id": row[0],
+                "name": row[1],
+                "stored": dict(zip(DELTA_COLUMNS, stored)),
+                "expected": dict(zip(DELTA_COLUMNS, actual)),
+            })
+    return drift
+
+
+def rebuild(db, repair=False):
+    drift = find_drift(db)
+    if repair and drift:
+        db.execute(
+            _set_totals,
+            [
+                {"player_id": d["player_id"], **{f"v_{c}": d["expected"][c] for c in DELTA_COLUMNS}}
+                for d in drift
+            ],
+        )
+    return {"drifted_players": len(drift), "repaired": repair and bool(drift), "players": drift}
+
+
+def repair(db):
+    # Contadores, buckets diários e o reset do log de alterações entram na
+    # mesma transação: uma falha no meio não deixa o reparo pela metade.
+    import rollups  # rollups importa este módulo
+
+    report = rebuild(db, repair=True)
+    rollups.rebuild(db)
+    changelog.record_reset(db)
+    db.commit()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula os agregados dos jogadores a partir das partidas.")
+    parser.add_argument("--repair", action="store_true", help="corrige os contadores divergentes e refaz os buckets diários")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = repair(db) if args.repair else rebuild(db)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        db.close()
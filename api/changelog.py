@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func
+import models
+
+RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+MAX_CHANGES = 5000
+# Chave do advisory lock que serializa as escritas no log (Postgres)
+LOCK_KEY = 7202501
+
+MATCH_COLUMNS = ["id", "date", "map", "score_blue", "score_red"]
+
+_log_table = models.ChangeLog.__table__
+_match_table = models.Match.__table__
+_player_table = models.Player.__table__
+
+
+def _serialize(db):
+    # /changes?since= supõe que todo seq menor que um já visto está gravado.
+    # No SQLite há um escritor só; no Postgres duas transações podem pegar os
+    # seqs 10 e 11 e gravar na ordem inversa. Com o lock até o fim da
+    # transação, os seqs são alocados na mesma ordem dos commits.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_KEY)))
+
+
+def record(db, entity, entity_ids, op="upsert"):
+    now = datetime.utcnow()
+    rows = [{"entity": entity, "entity_id": entity_id, "op": op, "created_at": now} for entity_id in dict.fromkeys(entity_ids)]
+    if rows:
+        _serialize(db)
+        db.execute(insert(_log_table), rows)
+
+
+def record_reset(db):
+    _serialize(db)
+    db.execute(insert(_log_table).values(entity="reset", op="reset", created_at=datetime.utcnow()))
+
+
+def latest_seq(db):
+    return db.scalar(select(func.max(_log_table.c.seq))) or 0
+
+
+def compact(db, retention_days=RETENTION_DAYS):
+    # Nunca apaga a última entrada: ela marca até onde a sequência chegou,
+    # e o menor seq restante diz a partir de onde um cliente precisa de reset.
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    removed = db.execute(
+        delete(_log_table).where(_log_table.c.created_at < cutoff, _log_table.c.seq < latest_seq(db))
+    ).rowcount
+    db.commit()
+    return removed
+
+
+def _snapshot(db, seq):
+    return {
+        "seq": seq,
+        "reset": True,
+        "more": False,
+        "matches": [dict(zip(MATCH_COLUMNS, row)) for row in db.execute(
+            select(*[_match_table.c[c] for c in MATCH_COLUMNS]).order_by(_match_table.c.id)
+        )],
+        "deleted_matches": [],
+        "players": [dict(r) for r in db.execute(select(_player_table)).mappings()],
+    }
+
+
+def changes_since(db, since, limit=MAX_CHANGES):
+    # since=0 (ou um seq já compactado, ou um reset no meio) devolve o
+    # estado completo; caso contrário só o que mudou, em páginas de `limit`.
+    latest = latest_seq(db)
+    oldest = db.scalar(select(func.min(_log_table.c.seq)))
+    if since <= 0 or since > latest or oldest is None or since < oldest - 1:
+        return _snapshot(db, latest)
+
+    entries = db.execute(
+        select(_log_table.c.seq, _log_table.c.entity, _log_table.c.entity_id, _log_table.c.op)
+        .where(_log_table.c.seq > since)
+        .order_by(_log_table.c.seq)
+        .limit(limit + 1)
+    ).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+    if any(entity == "reset" for _, entity, _, _ in entries):
+        return _snapshot(db, latest)
+
+    matches = {}
+    players = set()
+    for _, entity, entity_id, op in entries:
+        if entity == "match":
+            matches[entity_id] = op
+        elif entity == "player":
+            players.add(entity_id)
+
+    upserted = [match_id for match_id, op in matches.items() if op == "upsert"]
+    match_rows = db.execute(
+        select(*[_match_table.c[c] for c in MATCH_COLUMNS]).where(_match_table.c.id.in_(upserted)).order_by(_match_table.c.id)
+    ).all() if upserted else []
+    player_rows = db.execute(
+        select(_player_table).where(_player_table.c.id.in_(players))
+    ).mappings().all() if players else []
+
+    return {
+        "seq": entries[-1][0] if entries else since,
+        "reset": False,
+        "more": more,
+        "matches": [dict(zip(MATCH_COLUMNS, row)) for row in match_rows],
+        "deleted_matches": [match_id for match_id, op in matches.items() if op == "delete"],
+        "players": [dict(r) for r in player_rows],
+    }
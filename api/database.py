@@ -1,9 +1,86 @@
-from sqlalchemy import create_engine
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import metrics
 
-DATABASE_URL = "sqlite:///./fpl.db"
+load_dotenv()
+
+def _normalize_url(url):
+    # Render/Heroku expõem "postgres://", que o SQLAlchemy não aceita mais
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+def _async_url(url):
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+DATABASE_URL = _normalize_url(os.getenv("DATABASE_URL", "sqlite:///./fpl.db"))
+ASYNC_DATABASE_URL = _normalize_url(os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+engine_options = {"pool_pre_ping": True}
+if ":memory:" not in DATABASE_URL:
+    engine_options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **engine_options
+)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+metrics.install_sql_hooks(engine)
+metrics.install_sql_hooks(async_engine.sync_engine)
+
+def upsert(db, table):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+def insert_rows(db, table, columns, rows, conflict=None, increment=()):
+    # executemany direto no driver com tuplas: em cargas grandes, montar e
+    # processar um dict por linha custa mais que o próprio INSERT
+    if not rows:
+        return
+    dialect = db.get_bind().dialect
+    quote = dialect.identifier_preparer.quote
+    mark = "?" if dialect.paramstyle == "qmark" else "%s"
+    sql = (
+        f"INSERT INTO {quote(table.name)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join([mark] * len(columns))})"
+    )
+    if conflict:
+        updates = ", ".join(f"{quote(c)} = {quote(table.name)}.{quote(c)} + excluded.{quote(c)}" for c in increment)
+        sql += f" ON CONFLICT ({', '.join(quote(c) for c in conflict)}) DO UPDATE SET {updates}"
+    db.connection().exec_driver_sql(sql, list(map(tuple, rows)))
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
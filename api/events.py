@@ -0,0 +1,111 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections import defaultdict
+from ingest import player_delta
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+HEARTBEAT_SECONDS = 15
+
+
+class Hub:
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type, **data):
+        # As rotas de escrita são síncronas e rodam no threadpool; a entrega
+        # sempre passa pelo loop para não mexer nas filas de outra thread.
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        event = {"id": next(self._ids), "type": event_type, **data}
+        try:
+            loop.call_soon_threadsafe(self._broadcast, event)
+        except RuntimeError:
+            pass
+
+    def _broadcast(self, event):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o que estava pendente e pede que ele
+                # recarregue tudo, em vez de segurar quem publica.
+                logger.warning("Fila de eventos cheia; enviando reset ao cliente")
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"id": event["id"], "type": "reset"})
+
+    async def stream(self, request):
+        queue = self.subscribe()
+        try:
+            yield ": conectado\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            self.unsubscribe(queue)
+
+
+def format_event(event):
+    payload = json.dumps(event, default=str, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def roster_deltas(players, score_blue, score_red, sign=1, skipped=()):
+    # players: objetos com player_name, team, kills, deaths, assists
+    return {
+        p.player_name: {
+            c: sign * v
+            for c, v in player_delta(p.team, p.kills, p.deaths, p.assists, score_blue, score_red).items()
+        }
+        for p in players
+        if p.player_name not in skipped
+    }
+
+
+def merge_deltas(all_deltas):
+    total = defaultdict(lambda: defaultdict(int))
+    for deltas in all_deltas:
+        for name, delta in deltas.items():
+            for c, v in delta.items():
+                total[name][c] += v
+    return {name: dict(delta) for name, delta in total.items()}
+
+
+def publish_matches(version, imported):
+    # imported: [(MatchCreate, resultado de ingest.ingest_matches), ...]
+    if not imported:
+        return
+    hub.publish(
+        "matches_created",
+        version=version,
+        match_ids=[r["match_id"] for _, r in imported],
+        players=merge_deltas(
+            roster_deltas(data.players, data.score_blue, data.score_red, skipped=r.get("skipped_players", ()))
+            for data, r in imported
+        )
+    )
+
+
+hub = Hub()
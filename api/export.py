@@ -0,0 +1,123 @@
+import csv
+import io
+from sqlalchemy import select
+from database import SessionLocal
+import models
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CHUNK_SIZE = 10000
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+COLUMNS = [
+    "match_id", "date", "map", "score_blue", "score_red",
+    "player_id", "player_name", "team", "kills", "deaths", "assists",
+]
+
+
+def export_query(since=None):
+    mp = models.MatchPlayer
+    m = models.Match
+    query = (
+        select(
+            mp.match_id, m.date, m.map, m.score_blue, m.score_red,
+            mp.player_id, models.Player.name.label("player_name"), mp.team, mp.kills, mp.deaths, mp.assists,
+        )
+        .join(m, m.id == mp.match_id)
+        .join(models.Player, models.Player.id == mp.player_id)
+        .order_by(mp.id)
+    )
+    if since is not None:
+        query = query.where(m.date >= since)
+    return query
+
+
+def arrow_schema():
+    return pa.schema([
+        ("match_id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("map", pa.string()),
+        ("score_blue", pa.int32()),
+        ("score_red", pa.int32()),
+        ("player_id", pa.int64()),
+        ("player_name", pa.string()),
+        ("team", pa.string()),
+        ("kills", pa.int32()),
+        ("deaths", pa.int32()),
+        ("assists", pa.int32()),
+    ])
+
+
+def requires_pyarrow(fmt):
+    return fmt in ("arrow", "parquet") and pa is None
+
+
+def _chunks(since):
+    # A sessão vive dentro do gerador: a resposta é transmitida depois que a
+    # rota já retornou, então não dá para reaproveitar a sessão da dependência.
+    db = SessionLocal()
+    try:
+        result = db.execute(export_query(since).execution_options(yield_per=CHUNK_SIZE))
+        for rows in result.partitions():
+            yield rows
+    finally:
+        db.close()
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def stream_csv(since=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in _chunks(since):
+        writer.writerows(rows)
+        yield _drain(buffer).encode()
+    yield _drain(buffer).encode()
+
+
+def _record_batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.record_batch(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def stream_arrow(since=None):
+    schema = arrow_schema()
+    buffer = io.BytesIO()
+    writer = pa.ipc.new_stream(buffer, schema)
+    for rows in _chunks(since):
+        writer.write_batch(_record_batch(schema, rows))
+        yield _drain(buffer)
+    writer.close()
+    yield _drain(buffer)
+
+
+def stream_parquet(since=None):
+    # Cada lote vira um row group; o rodapé só é escrito no fechamento.
+    schema = arrow_schema()
+    buffer = io.BytesIO()
+    writer = pq.ParquetWriter(buffer, schema)
+    for rows in _chunks(since):
+        writer.write_batch(_record_batch(schema, rows))
+        yield _drain(buffer)
+    writer.close()
+    yield _drain(buffer)
+
+
+STREAMERS = {"csv": stream_csv, "arrow": stream_arrow, "parquet": stream_parquet}
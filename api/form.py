@@ -0,0 +1,131 @@
+from sqlalchemy import select, func, case, cast, literal, BigInteger, Integer
+import models
+from versioning import VersionedCache, data_version
+
+FORM_WINDOW = 10
+LEADERBOARD_FORM_WINDOW = 5
+MAX_WINDOW = 50
+
+form_cache = VersionedCache(data_version, max_entries=256)
+
+
+def _ordered(names):
+    # Só as partidas dos jogadores pedidos: o filtro usa o índice
+    # (player_id, match_id) e a ordenação fica restrita a elas.
+    mp = models.MatchPlayer
+    m = models.Match
+    winner = case((m.score_blue > m.score_red, "blue"), else_="red")
+    return (
+        select(
+            mp.player_id,
+            mp.kills,
+            mp.deaths,
+            case((mp.team == winner, 1), else_=0).label("won"),
+            case((mp.kills >= mp.deaths, 1), else_=0).label("positive"),
+            func.row_number().over(partition_by=mp.player_id, order_by=(m.date.desc(), m.id.desc())).label("rn"),
+        )
+        .join(m, m.id == mp.match_id)
+        .where(mp.player_id.in_(select(models.Player.id).where(models.Player.name.in_(names))))
+        .cte("ordered")
+    )
+
+
+def recent_query(names, window):
+    o = _ordered(names).c
+    # Resultado das últimas partidas como bits: o bit 0 é a mais recente
+    bit = cast(literal(1), BigInteger).op("<<")(cast(o.rn - 1, Integer))
+    return (
+        select(
+            models.Player.name,
+            func.count().label("matches"),
+            func.sum(o.won).label("wins"),
+            func.sum(o.kills).label("kills"),
+            func.sum(o.deaths).label("deaths"),
+            func.sum(o.won * bit).label("form_bits"),
+        )
+        .join(models.Player, models.Player.id == o.player_id)
+        .where(o.rn <= window)
+        .group_by(o.player_id, models.Player.name)
+    )
+
+
+def streaks_query(name):
+    o = _ordered([name]).c
+
+    # Para cada partida, a posição da última derrota (e da última partida com
+    # K/D < 1) mais recente que ela; rn menos essa posição é o tamanho da
+    # sequência que termina ali.
+    runs = select(
+        o.won, o.positive, o.rn,
+        func.max(case((o.won == 0, o.rn))).over(order_by=o.rn).label("last_loss"),
+        func.max(case((o.positive == 0, o.rn))).over(order_by=o.rn).label("last_negative"),
+    ).cte("runs")
+
+    r = runs.c
+    first_loss = func.min(case((r.won == 0, r.rn)))
+    first_win = func.min(case((r.won == 1, r.rn)))
+    total = func.count()
+    return select(
+        func.max(case((r.rn == 1, r.won), else_=0)).label("last_won"),
+        func.coalesce(first_loss - 1, total).label("win_streak"),
+        func.coalesce(first_win - 1, total).label("loss_streak"),
+        func.coalesce(func.max(case((r.won == 1, r.rn - func.coalesce(r.last_loss, 0)))), 0).label("best_win_streak"),
+        func.coalesce(func.max(case((r.positive == 1, r.rn - func.coalesce(r.last_negative, 0)))), 0).label("best_kd_streak"),
+    )
+
+
+def _record(row, window):
+    matches = row["matches"]
+    wins = row["wins"]
+    return {
+        "window": window,
+        "matches": matches,
+        "wins": wins,
+        "losses": matches - wins,
+        "winrate": round(wins / matches * 100, 2) if matches else 0,
+        "kd": round(row["kills"] / max(row["deaths"], 1), 2),
+        "form": "".join("V" if row["form_bits"] >> k & 1 else "D" for k in range(matches)),
+    }
+
+
+def empty_summary(window):
+    return {
+        "window": window, "matches": 0, "wins": 0, "losses": 0, "winrate": 0, "kd": 0,
+        "form": "", "current_streak": 0, "best_win_streak": 0, "best_kd_streak": 0,
+    }
+
+
+def load_recent(db, names, window):
+    if not names:
+        return {}
+    rows = db.execute(recent_query(names, window)).mappings().all()
+    return {row["name"]: _record(row, window) for row in rows}
+
+
+def load_player_form(db, name, window=FORM_WINDOW):
+    record = load_recent(db, [name], window).get(name)
+    if record is None:
+        return None
+    streaks = db.execute(streaks_query(name)).mappings().one()
+    return {
+        **record,
+        "current_streak": streaks["win_streak"] if streaks["last_won"] else -streaks["loss_streak"],
+        "best_win_streak": streaks["best_win_streak"],
+        "best_kd_streak": streaks["best_kd_streak"],
+    }
+
+
+def clamp_window(window):
+    return max(1, min(window, MAX_WINDOW))
+
+
+def get_player_form(db, name, window=FORM_WINDOW):
+    window = clamp_window(window)
+    return form_cache.get(("player", name, window), lambda: load_player_form(db, name, window))
+
+
+def get_recent_form(db, names, window=LEADERBOARD_FORM_WINDOW):
+    # Usado pelo ranking: só os jogadores da página, sem as sequências
+    window = clamp_window(window)
+    names = tuple(names)
+    return form_cache.get(("recent", names, window), lambda: load_recent(db, names, window))
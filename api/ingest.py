@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, bindparam, func
+import models
+import changelog
+import pairs
+import ratings
+from database import upsert
+
+DEFAULT_BATCH_SIZE = 500
+
+DELTA_COLUMNS = ["matches", "wins", "losses", "roundsWon", "roundsLost", "kills", "deaths", "assists"]
+
+_player_table = models.Player.__table__
+_match_table = models.Match.__table__
+_match_player_table = models.MatchPlayer.__table__
+_bucket_table = models.PlayerDailyStats.__table__
+
+_apply_deltas = (
+    update(_player_table)
+    .where(_player_table.c.id == bindparam("player_id"))
+    .values({c: _player_table.c[c] + bindparam(f"d_{c}") for c in DELTA_COLUMNS})
+)
+
+
+def winning_team(score_blue, score_red):
+    return "blue" if score_blue > score_red else "red"
+
+
+def player_delta(team, kills, deaths, assists, score_blue, score_red):
+    won = team == winning_team(score_blue, score_red)
+    return {
+        "matches": 1,
+        "wins": 1 if won else 0,
+        "losses": 0 if won else 1,
+        "roundsWon": score_blue if team == "blue" else score_red,
+        "roundsLost": score_red if team == "blue" else score_blue,
+        "kills": kills,
+        "deaths": deaths,
+        "assists": assists,
+    }
+
+
+def apply_player_deltas(db, deltas, sign=1):
+    if not deltas:
+        return
+    db.execute(
+        _apply_deltas,
+        [
+            {"player_id": player_id, **{f"d_{c}": sign * delta[c] for c in DELTA_COLUMNS}}
+            for player_id, delta in deltas.items()
+        ],
+    )
+
+
+def empty_delta():
+    return dict.fromkeys(DELTA_COLUMNS, 0)
+
+
+def bucket_key(player_id, date, map_name):
+    return (player_id, date.date(), map_name)
+
+
+def apply_bucket_deltas(db, deltas, sign=1):
+    if not deltas:
+        return
+    stmt = upsert(db, _bucket_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_bucket_table.c.player_id, _bucket_table.c.day, _bucket_table.c.map],
+        set_={c: _bucket_table.c[c] + stmt.excluded[c] for c in DELTA_COLUMNS},
+    )
+    db.execute(
+        stmt,
+        [
+            {"player_id": player_id, "day": day, "map": map_name, **{c: sign * delta[c] for c in DELTA_COLUMNS}}
+            for (player_id, day, map_name), delta in deltas.items()
+        ],
+    )
+    if sign < 0:
+        for day, map_name in {(day, map_name) for _, day, map_name in deltas}:
+            db.execute(
+                delete(_bucket_table)
+                .where(_bucket_table.c.day == day, _bucket_table.c.map == map_name, _bucket_table.c.matches <= 0)
+            )
+
+
+def remove_match_buckets(db, match, match_players):
+    buckets = defaultdict(empty_delta)
+    for mp in match_players:
+        bucket = buckets[bucket_key(mp.player_id, match.date, match.map)]
+        delta = player_delta(mp.team, mp.kills, mp.deaths, mp.assists, match.score_blue, match.score_red)
+        for c in DELTA_COLUMNS:
+            bucket[c] += delta[c]
+    apply_bucket_deltas(db, buckets, sign=-1)
+
+
+def insert_matches(db, rows):
+    if db.get_bind().dialect.name != "sqlite":
+        return db.scalars(
+            insert(_match_table).returning(_match_table.c.id, sort_by_parameter_order=True), rows
+        ).all()
+    # O SQLite não garante a ordem do RETURNING num INSERT de várias linhas, e
+    # o SQLAlchemy cairia para um comando por partida. Depois do executemany a
+    # transação já segura o lock de escrita, e as partidas novas são as últimas
+    # da tabela, com ids em sequência.
+    db.execute(insert(_match_table), rows)
+    last_id = db.scalar(select(func.max(_match_table.c.id)))
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def ingest_matches(db, matches):
+    if not matches:
+        return []
+
+    names = {p.player_name for m in matches for p in m.players}
+    player_ids = dict(
+        db.execute(select(models.Player.name, models.Player.id).where(models.Player.name.in_(names))).all()
+    )
+
+    now = datetime.utcnow()
+    match_ids = insert_matches(db, [
+        {
+            "map": m.map,
+            "score_blue": m.score_blue,
+            "score_red": m.score_red,
+            "date": m.date or now,
+        }
+        for m in matches
+    ])
+
+    match_player_rows = []
+    deltas = defaultdict(empty_delta)
+    buckets = defaultdict(empty_delta)
+    rosters = []
+    results = []
+    for match_id, m in zip(match_ids, matches):
+        date = m.date or now
+        roster = []
+        skipped = []
+        for p in m.players:
+            player_id = player_ids.get(p.player_name)
+            if player_id is None:
+                skipped.append(p.player_name)
+                continue
+
+            roster.append((player_id, p.team))
+            match_player_rows.append({
+                "match_id": match_id,
+                "player_id": player_id,
+                "team": p.team,
+                "kills": p.kills,
+                "deaths": p.deaths,
+                "assists": p.assists,
+            })
+            delta = player_delta(p.team, p.kills, p.deaths, p.assists, m.score_blue, m.score_red)
+            bucket = buckets[bucket_key(player_id, date, m.map)]
+            for c in DELTA_COLUMNS:
+                deltas[player_id][c] += delta[c]
+                bucket[c] += delta[c]
+
+        rosters.append((match_id, date, m.score_blue, m.score_red, roster))
+        result = {"match_id": match_id}
+        if skipped:
+            result["skipped_players"] = skipped
+        results.append(result)
+
+    if match_player_rows:
+        db.execute(insert(_match_player_table), match_player_rows)
+    apply_player_deltas(db, deltas)
+    apply_bucket_deltas(db, buckets)
+    ratings.apply_matches(db, rosters)
+    pairs.add_matches(db, rosters)
+    changelog.record(db, "match", match_ids)
+    changelog.record(db, "player", deltas)
+    return results
@@ -1,8 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional
+from datetime import date, datetime
 from fastapi.middleware.cors import CORSMiddleware
-from database import SessionLocal, engine
-import models, schemas
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from database import SessionLocal, AsyncSessionLocal, engine
+import models, schemas, ingest, aggregates, rollups, ratings, pairs, maps, metrics, migrate_player_id, export, events, writebehind, search, changelog, form, scoreboards
+from ranking import MIN_MATCHES
+from responses import fast_json, parse_fields, rows_to_dicts
+from versioning import data_version
+import ranking
 import logging
 from dotenv import load_dotenv
 import os
@@ -14,7 +25,20 @@ load_dotenv()
 ADMIN_USER = os.getenv("ADMIN_USER")
 ADMIN_PASS = os.getenv("ADMIN_PASS")
 
+migrate_player_id.migrate(engine)
 models.Base.metadata.create_all(bind=engine)
+with SessionLocal() as _db:
+    rollups.backfill_if_empty(_db)
+    ratings.backfill_if_empty(_db)
+    pairs.backfill_if_empty(_db)
+    changelog.compact(_db)
+if writebehind.ENABLED:
+    writebehind.queue.start()
+
+MAX_HISTORY_PAGE = 100
+MAX_LEADERBOARD_PAGE = 200
+PLAYER_FIELDS = [c.name for c in models.Player.__table__.columns]
+PERIOD_STATS_FIELDS = ["name", *ingest.DELTA_COLUMNS]
 
 app = FastAPI()
 
@@ -25,6 +49,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(metrics.middleware)
 
 def get_db():
     db = SessionLocal()
@@ -33,6 +58,22 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/events")
+async def stream_events(request: Request):
+    return StreamingResponse(
+        events.hub.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/login")
 def login(data: schemas.LoginRequest):
     if data.username == ADMIN_USER and data.password == ADMIN_PASS:
@@ -49,8 +90,12 @@ def create_player(player: schemas.PlayerCreate, db: Session = Depends(get_db)):
 
         new_player = models.Player(name=player.name)
         db.add(new_player)
+        db.flush()
+        changelog.record(db, "player", [new_player.id])
         db.commit()
         db.refresh(new_player)
+        search.name_index.add(new_player.name)
+        events.hub.publish("player_created", version=data_version.bump(), name=new_player.name)
         return {"msg": "Jogador cadastrado com sucesso."}
     except Exception as e:
         logger.error(f"Erro ao cadastrar jogador: {e}", exc_info=True)
@@ -63,9 +108,11 @@ def update_player_name(old_name: str, new_data: schemas.PlayerCreate, db: Sessio
         if not player:
             raise HTTPException(status_code=404, detail="Jogador não encontrado")
 
-        db.query(models.MatchPlayer).filter(models.MatchPlayer.player_name == old_name).update({"player_name": new_data.name})
         player.name = new_data.name
+        changelog.record(db, "player", [player.id])
         db.commit()
+        search.name_index.rename(old_name, new_data.name)
+        events.hub.publish("player_renamed", version=data_version.bump(), old_name=old_name, name=new_data.name)
         return {"msg": "Nome do jogador atualizado com sucesso."}
     except Exception as e:
         logger.error(f"Erro ao atualizar nome do jogador: {e}", exc_info=True)
@@ -77,13 +124,18 @@ def delete_match(match_id: int, adjust_stats: bool = True, db: Session = Depends
     if not match:
         return {"error": "Partida não encontrada"}
 
-    players = db.query(models.MatchPlayer).filter_by(match_id=match_id).all()
+    players = (
+        db.query(models.MatchPlayer)
+        .options(joinedload(models.MatchPlayer.player))
+        .filter_by(match_id=match_id)
+        .all()
+    )
 
     if adjust_stats:
         winning_team = "blue" if match.score_blue > match.score_red else "red"
 
         for p in players:
-            player = db.query(models.Player).filter(models.Player.name == p.player_name).first()
+            player = p.player
             if player:
                 player.matches = max(0, player.matches - 1)
                 if p.team == winning_team:
@@ -98,24 +150,52 @@ def delete_match(match_id: int, adjust_stats: bool = True, db: Session = Depends
                 player.assists = max(0, player.assists - p.assists)
                 db.add(player)
 
+    deltas = events.roster_deltas(players, match.score_blue, match.score_red, sign=-1) if adjust_stats else {}
+    ingest.remove_match_buckets(db, match, players)
+    pairs.remove_match(db, match, players)
     for p in players:
         db.delete(p)
 
     db.delete(match)
+    ratings.replay(db, since=(match.date, match_id))
+    changelog.record(db, "match", [match_id], op="delete")
+    if adjust_stats:
+        changelog.record(db, "player", [p.player_id for p in players])
     db.commit()
+    events.hub.publish("match_deleted", version=data_version.bump(), match_id=match_id, players=deltas)
     return {"msg": "Partida excluída e estatísticas ajustadas com sucesso"}
 
 @app.put("/matches/{match_id}/players/{player_name}")
 def update_match_player_stats(match_id: int, player_name: str, stats: schemas.MatchPlayerBase, db: Session = Depends(get_db)):
     try:
-        player_match = db.query(models.MatchPlayer).filter_by(match_id=match_id, player_name=player_name).first()
+        player = db.query(models.Player).filter(models.Player.name == player_name).first()
+        player_match = None
+        if player:
+            player_match = db.query(models.MatchPlayer).filter_by(match_id=match_id, player_id=player.id).first()
         if not player_match:
             raise HTTPException(status_code=404, detail="Dados do jogador na partida não encontrados")
 
+        player.kills += stats.kills - player_match.kills
+        player.deaths += stats.deaths - player_match.deaths
+        player.assists += stats.assists - player_match.assists
+
+        match = player_match.match
+        bucket = ingest.empty_delta()
+        bucket.update(
+            kills=stats.kills - player_match.kills,
+            deaths=stats.deaths - player_match.deaths,
+            assists=stats.assists - player_match.assists
+        )
+        ingest.apply_bucket_deltas(db, {ingest.bucket_key(player.id, match.date, match.map): bucket})
+
+        deltas = {player_name: {c: bucket[c] for c in ("kills", "deaths", "assists")}}
         player_match.kills = stats.kills
         player_match.deaths = stats.deaths
         player_match.assists = stats.assists
+        changelog.record(db, "match", [match_id])
+        changelog.record(db, "player", [player.id])
         db.commit()
+        events.hub.publish("stats_edited", version=data_version.bump(), match_id=match_id, players=deltas)
         return {"msg": "Estatísticas da partida atualizadas com sucesso."}
     except Exception as e:
         logger.error(f"Erro ao atualizar estatísticas do jogador na partida: {e}", exc_info=True)
@@ -123,64 +203,143 @@ def update_match_player_stats(match_id: int, player_name: str, stats: schemas.Ma
 
 @app.post("/matches")
 def create_match(data: schemas.MatchCreate, db: Session = Depends(get_db)):
+    if writebehind.ENABLED:
+        try:
+            ticket = writebehind.queue.enqueue(data)
+            return {"ticket": ticket, "status": "pending", "msg": "Partida recebida e enfileirada para gravação"}
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar partida: {e}", exc_info=True)
+            return {"error": "Erro interno ao enfileirar a partida"}
     try:
-        match = models.Match(
-            map=data.map,
-            score_blue=data.score_blue,
-            score_red=data.score_red
-        )
-        db.add(match)
+        result = ingest.ingest_matches(db, [data])[0]
         db.commit()
-        db.refresh(match)
-
-        winning_team = "blue" if match.score_blue > match.score_red else "red"
-
-        for p in data.players:
-            player = db.query(models.Player).filter(models.Player.name == p.player_name).first()
-
-            if not player:
-                continue
-
-            player.matches += 1
-            if p.team == winning_team:
-                player.wins += 1
-            else:
-                player.losses += 1
-
-            player.roundsWon += match.score_blue if p.team == "blue" else match.score_red
-            player.roundsLost += match.score_red if p.team == "blue" else match.score_blue
+        events.hub.publish(
+            "match_created",
+            version=data_version.bump(),
+            match_id=result["match_id"],
+            players=events.roster_deltas(data.players, data.score_blue, data.score_red, skipped=result.get("skipped_players", ()))
+        )
+        return {"match_id": result["match_id"], "msg": "Partida salva com sucesso"}
 
-            player.kills += p.kills
-            player.deaths += p.deaths
-            player.assists += p.assists
+    except Exception as e:
+        logger.error(f"Erro ao criar partida: {e}", exc_info=True)
+        return {"error": "Erro interno ao registrar a partida"}
 
-            db.add(player)
+def _ingest_batch(batch):
+    db = SessionLocal()
+    try:
+        results = ingest.ingest_matches(db, [data for _, data in batch])
+        db.commit()
+        return [{"line": line, **result} for (line, _), result in zip(batch, results)]
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao importar lote de partidas: {e}", exc_info=True)
+        return [{"line": line, "error": "Erro interno ao importar lote"} for line, _ in batch]
+    finally:
+        db.close()
 
-            mp = models.MatchPlayer(
-                match_id=match.id,
-                player_name=p.player_name,
-                team=p.team,
-                kills=p.kills,
-                deaths=p.deaths,
-                assists=p.assists
+@app.post("/matches/bulk")
+async def create_matches_bulk(request: Request, batch_size: int = ingest.DEFAULT_BATCH_SIZE):
+    batch_size = max(1, batch_size)
+    report = []
+    batch = []
+    line_number = 0
+    buffer = b""
+
+    async def flush():
+        if batch:
+            results = await run_in_threadpool(_ingest_batch, list(batch))
+            report.extend(results)
+            imported = [(data, r) for (_, data), r in zip(batch, results) if "match_id" in r]
+            batch.clear()
+            events.publish_matches(data_version.bump(), imported)
+
+    async def handle(raw):
+        nonlocal line_number
+        line_number += 1
+        if not raw.strip():
+            return
+        try:
+            batch.append((line_number, schemas.MatchCreate.model_validate_json(raw)))
+        except ValidationError as e:
+            report.append({"line": line_number, "error": e.errors(include_url=False, include_context=False, include_input=False)})
+            return
+        if len(batch) >= batch_size:
+            await flush()
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            await handle(raw)
+    if buffer:
+        await handle(buffer)
+    await flush()
+
+    report.sort(key=lambda r: r["line"])
+    imported = sum(1 for r in report if "match_id" in r)
+    return {"imported": imported, "failed": len(report) - imported, "results": report}
+
+@app.get("/matches")
+async def get_matches(request: Request, response: Response, ids: str = "", db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        match_ids = scoreboards.parse_ids(ids)
+    except ValueError:
+        return {"error": "Parâmetro ids inválido; use ids=1,2,3"}
+    if len(match_ids) > scoreboards.MAX_IDS:
+        return {"error": f"No máximo {scoreboards.MAX_IDS} partidas por requisição"}
+    try:
+        if len(match_ids) > scoreboards.STREAM_CHUNK:
+            return StreamingResponse(
+                scoreboards.stream_by_ids(match_ids),
+                media_type="application/json",
+                headers=dict(response.headers)
             )
-            db.add(mp)
-
-        db.commit()
-        return {"match_id": match.id, "msg": "Partida salva com sucesso"}
+        return fast_json(await scoreboards.load_by_ids(db, match_ids), response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar partidas {ids}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar partidas"}
+
+@app.get("/matches/recent")
+async def get_recent_matches(request: Request, response: Response, limit: int = 20, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        limit = max(1, min(limit, scoreboards.MAX_RECENT))
+        return fast_json(await scoreboards.load_recent(db, limit), response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar partidas recentes: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar partidas recentes"}
 
+@app.get("/matches/pending")
+def get_pending_matches(ticket: Optional[str] = None):
+    if not writebehind.ENABLED:
+        return {"error": "Gravação assíncrona de partidas não está habilitada"}
+    try:
+        return writebehind.queue.status(ticket)
     except Exception as e:
-        logger.error(f"Erro ao criar partida: {e}", exc_info=True)
-        return {"error": "Erro interno ao registrar a partida"}
+        logger.error(f"Erro ao consultar partidas pendentes: {e}", exc_info=True)
+        return {"error": "Erro interno ao consultar partidas pendentes"}
 
 @app.get("/matches/{match_id}", response_model=schemas.MatchOut)
-def get_match(match_id: int, db: Session = Depends(get_db)):
+async def get_match(match_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
     try:
-        match = db.query(models.Match).filter(models.Match.id == match_id).first()
+        match = await db.get(models.Match, match_id)
         if not match:
             return {"error": "Partida não encontrada"}
 
-        players = db.query(models.MatchPlayer).filter_by(match_id=match.id).all()
+        players = (await db.scalars(
+            select(models.MatchPlayer)
+            .options(joinedload(models.MatchPlayer.player))
+            .filter_by(match_id=match.id)
+        )).all()
 
         return {
             "date": match.date,
@@ -197,47 +356,350 @@ def get_match(match_id: int, db: Session = Depends(get_db)):
         return {"error": "Erro interno ao buscar dados da partida"}
 
 @app.get("/players")
-def get_players(db: Session = Depends(get_db)):
+async def get_players(request: Request, response: Response, fields: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    columns, unknown = parse_fields(fields, PLAYER_FIELDS)
+    if unknown:
+        return {"error": f"Campos inválidos: {', '.join(unknown)}"}
     try:
-        return db.query(models.Player).all()
+        table = models.Player.__table__
+        rows = (await db.execute(select(*[table.c[c] for c in columns]))).all()
+        return fast_json(rows_to_dicts(columns, rows), response)
     except Exception as e:
         logger.error(f"Erro ao buscar jogadores: {e}", exc_info=True)
         return {"error": "Erro interno ao buscar jogadores"}
 
+@app.get("/players/search")
+def search_players(
+    request: Request,
+    response: Response,
+    q: str = "",
+    limit: int = search.DEFAULT_LIMIT,
+    db: Session = Depends(get_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        limit = max(1, min(limit, search.MAX_LIMIT))
+        return fast_json(search.name_index.search(db, q, limit), response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar jogadores por nome: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar jogadores"}
+
+@app.get("/leaderboard")
+def get_leaderboard(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    offset: int = 0,
+    min_matches: int = MIN_MATCHES,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    columns, unknown = parse_fields(fields, ranking.LEADERBOARD_FIELDS)
+    if unknown:
+        return {"error": f"Campos inválidos: {', '.join(unknown)}"}
+    try:
+        limit = max(1, min(limit, MAX_LEADERBOARD_PAGE))
+        offset = max(0, offset)
+        ranked = ranking.get_leaderboard(db, min_matches, date_from, date_to)
+        page = ranked[offset:offset + limit]
+        if "form" in columns:
+            recent = form.get_recent_form(db, [row["name"] for row in page], form.LEADERBOARD_FORM_WINDOW)
+            page = [{**row, "form": recent.get(row["name"], {}).get("form", "")} for row in page]
+        if fields:
+            page = [{c: row[c] for c in columns} for row in page]
+        return fast_json({
+            "total": len(ranked),
+            "limit": limit,
+            "offset": offset,
+            "players": page
+        }, response)
+    except Exception as e:
+        logger.error(f"Erro ao calcular ranking: {e}", exc_info=True)
+        return {"error": "Erro interno ao calcular ranking"}
+
+@app.get("/stats/players")
+async def get_period_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    map: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    columns, unknown = parse_fields(fields, PERIOD_STATS_FIELDS)
+    if unknown:
+        return {"error": f"Campos inválidos: {', '.join(unknown)}"}
+    try:
+        stat_columns = [c for c in columns if c != "name"]
+        rows = (await db.execute(rollups.window_query(date_from, date_to, map, columns=stat_columns))).all()
+        if "name" not in columns:
+            return fast_json(rows_to_dicts(stat_columns, [row[1:] for row in rows]))
+        return fast_json(rows_to_dicts(["name", *stat_columns], rows))
+    except Exception as e:
+        logger.error(f"Erro ao buscar estatísticas por período: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar estatísticas por período"}
+
+@app.get("/stats/maps")
+def get_map_stats(request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        return maps.get_map_overview(db)
+    except Exception as e:
+        logger.error(f"Erro ao buscar estatísticas dos mapas: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar estatísticas dos mapas"}
+
+@app.get("/players/{player_name}/maps")
+def get_player_map_stats(player_name: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        player = db.query(models.Player).filter(models.Player.name == player_name).first()
+        if not player:
+            return {"error": "Jogador não encontrado"}
+        return maps.get_player_maps(db, player.id)
+    except Exception as e:
+        logger.error(f"Erro ao buscar mapas do jogador {player_name}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar mapas do jogador"}
+
+@app.get("/players/{player_name}/form")
+def get_player_form(
+    player_name: str,
+    request: Request,
+    response: Response,
+    window: int = form.FORM_WINDOW,
+    db: Session = Depends(get_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        summary = form.get_player_form(db, player_name, window)
+        if summary is None:
+            if not db.query(models.Player.id).filter(models.Player.name == player_name).first():
+                return {"error": "Jogador não encontrado"}
+            summary = form.empty_summary(form.clamp_window(window))
+        return {"player": player_name, **summary}
+    except Exception as e:
+        logger.error(f"Erro ao calcular forma do jogador {player_name}: {e}", exc_info=True)
+        return {"error": "Erro interno ao calcular forma do jogador"}
+
 @app.get("/players/{player_name}/matches")
-def get_player_matches(player_name: str, db: Session = Depends(get_db)):
+async def get_player_matches(
+    player_name: str,
+    request: Request,
+    response: Response,
+    before_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
     try:
-        matches = (
-            db.query(models.MatchPlayer)
-            .filter(models.MatchPlayer.player_name == player_name)
-            .all()
+        limit = max(1, min(limit, MAX_HISTORY_PAGE))
+        player_id = await db.scalar(select(models.Player.id).where(models.Player.name == player_name))
+        mp = models.MatchPlayer
+        query = (
+            select(mp.match_id, models.Match.map, models.Match.date, mp.team, mp.kills, mp.deaths, mp.assists)
+            .join(models.Match, models.Match.id == mp.match_id)
+            .where(mp.player_id == player_id)
         )
-        result = []
-        for mp in matches:
-            match = db.query(models.Match).filter(models.Match.id == mp.match_id).first()
-            result.append({
-                "match_id": mp.match_id,
-                "map": match.map,
-                "date": match.date,
-                "team": mp.team,
-                "kills": mp.kills,
-                "deaths": mp.deaths,
-                "assists": mp.assists
-            })
-        return result
+        # Mais recentes primeiro pela data da partida: partidas importadas com
+        # data retroativa entram no lugar certo do histórico
+        if before_id is not None:
+            if before_date is None:
+                before_date = await db.scalar(select(models.Match.date).where(models.Match.id == before_id))
+            query = query.where(tuple_(models.Match.date, mp.match_id) < tuple_(before_date, before_id))
+        result = await db.execute(query.order_by(models.Match.date.desc(), mp.match_id.desc()).limit(limit + 1))
+        keys = list(result.keys())
+        rows = result.all()
+
+        matches = rows_to_dicts(keys, rows[:limit])
+        last = matches[-1] if len(rows) > limit else None
+        return fast_json({
+            "matches": matches,
+            "next_before": {"date": last["date"], "id": last["match_id"]} if last else None
+        }, response)
     except Exception as e:
         logger.error(f"Erro ao buscar partidas do jogador {player_name}: {e}", exc_info=True)
         return {"error": "Erro interno ao buscar partidas do jogador"}
 
+@app.get("/ratings")
+async def get_ratings(request: Request, response: Response, limit: int = 50, offset: int = 0, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        limit = max(1, min(limit, MAX_LEADERBOARD_PAGE))
+        result = await db.execute(ratings.leaderboard_query().limit(limit).offset(max(0, offset)))
+        return fast_json(rows_to_dicts(result.keys(), result.all()), response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar ratings: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar ratings"}
+
+@app.get("/players/{player_name}/ratings")
+async def get_player_ratings(
+    player_name: str,
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        player_id = await db.scalar(select(models.Player.id).where(models.Player.name == player_name))
+        if player_id is None:
+            return {"error": "Jogador não encontrado"}
+        limit = max(1, min(limit, MAX_LEADERBOARD_PAGE))
+        result = await db.execute(ratings.history_query(player_id).limit(limit))
+        return fast_json(rows_to_dicts(result.keys(), result.all()), response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar histórico de rating do jogador {player_name}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar histórico de rating"}
+
+def _pair_summary(row):
+    matches_with = row["wins_with"] + row["losses_with"]
+    matches_against = row["wins_against"] + row["losses_against"]
+    return {
+        **row,
+        "matches_with": matches_with,
+        "winrate_with": round(row["wins_with"] / matches_with * 100, 2) if matches_with else 0,
+        "matches_against": matches_against,
+        "winrate_against": round(row["wins_against"] / matches_against * 100, 2) if matches_against else 0
+    }
+
+@app.get("/players/{player_name}/synergy")
+async def get_player_synergy(player_name: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        player_id = await db.scalar(select(models.Player.id).where(models.Player.name == player_name))
+        if player_id is None:
+            return {"error": "Jogador não encontrado"}
+        result = await db.execute(pairs.synergy_query(player_id))
+        return fast_json([_pair_summary(r) for r in rows_to_dicts(result.keys(), result.all())], response)
+    except Exception as e:
+        logger.error(f"Erro ao buscar sinergia do jogador {player_name}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar sinergia do jogador"}
+
+@app.get("/players/{player_name}/vs/{other_name}")
+async def get_head_to_head(
+    player_name: str,
+    other_name: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
+    try:
+        ids = dict((await db.execute(
+            select(models.Player.name, models.Player.id).where(models.Player.name.in_([player_name, other_name]))
+        )).all())
+        if player_name not in ids or other_name not in ids:
+            return {"error": "Jogador não encontrado"}
+        row = (await db.execute(pairs.pair_query(ids[player_name], ids[other_name]))).mappings().first()
+        counts = dict(row) if row else dict.fromkeys(pairs.PAIR_COLUMNS, 0)
+        return {"player": player_name, "opponent": other_name, **_pair_summary(counts)}
+    except Exception as e:
+        logger.error(f"Erro ao buscar confronto {player_name} x {other_name}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar confronto"}
+
+@app.get("/export/match_players")
+def export_match_players(format: str = "csv", since: Optional[datetime] = None):
+    if format not in export.FORMATS:
+        return {"error": f"Formato inválido; use {', '.join(export.FORMATS)}"}
+    if export.requires_pyarrow(format):
+        return {"error": f"Exportação em {format} requer pyarrow instalado no servidor"}
+    return StreamingResponse(
+        export.STREAMERS[format](since),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="match_players.{format}"'}
+    )
+
+@app.get("/changes")
+def get_changes(since: int = 0, limit: int = changelog.MAX_CHANGES, db: Session = Depends(get_db)):
+    try:
+        return fast_json(changelog.changes_since(db, since, max(1, min(limit, changelog.MAX_CHANGES))))
+    except Exception as e:
+        logger.error(f"Erro ao buscar alterações desde {since}: {e}", exc_info=True)
+        return {"error": "Erro interno ao buscar alterações"}
+
 @app.get("/admin/overview")
-def admin_overview(db: Session = Depends(get_db)):
+async def admin_overview(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = data_version.conditional(request, response)
+    if not_modified:
+        return not_modified
     try:
-        total_matches = db.query(models.Match).count()
-        total_players = db.query(models.Player).count()
+        total_matches = await db.scalar(select(func.count()).select_from(models.Match))
+        total_players = await db.scalar(select(func.count()).select_from(models.Player))
         return {
             "total_matches": total_matches,
             "total_players": total_players
         }
     except Exception as e:
         logger.error(f"Erro ao carregar visão geral do admin: {e}", exc_info=True)
-        return {"error": "Erro interno ao carregar painel admin"}
\ No newline at end of file
+        return {"error": "Erro interno ao carregar painel admin"}
+
+@app.post("/admin/aggregates/rebuild")
+def rebuild_aggregates(repair: bool = False, db: Session = Depends(get_db)):
+    try:
+        if not repair:
+            return aggregates.rebuild(db)
+        report = aggregates.repair(db)
+        events.hub.publish("reset", version=data_version.bump())
+        return report
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao recalcular agregados dos jogadores: {e}", exc_info=True)
+        return {"error": "Erro interno ao recalcular agregados"}
+
+@app.post("/admin/pairs/rebuild")
+def rebuild_pairs(db: Session = Depends(get_db)):
+    try:
+        rebuilt = pairs.rebuild(db)
+        db.commit()
+        data_version.bump()
+        return {"pairs": rebuilt}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao recalcular pares de jogadores: {e}", exc_info=True)
+        return {"error": "Erro interno ao recalcular pares de jogadores"}
+
+@app.post("/admin/changes/compact")
+def compact_changes(retention_days: int = changelog.RETENTION_DAYS, db: Session = Depends(get_db)):
+    try:
+        return {"removed": changelog.compact(db, retention_days)}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao compactar log de alterações: {e}", exc_info=True)
+        return {"error": "Erro interno ao compactar log de alterações"}
+
+@app.post("/admin/ratings/replay")
+def replay_ratings(db: Session = Depends(get_db)):
+    try:
+        replayed = ratings.replay(db)
+        db.commit()
+        data_version.bump()
+        return {"replayed_matches": replayed}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao recalcular ratings: {e}", exc_info=True)
+        return {"error": "Erro interno ao recalcular ratings"}
\ No newline at end of file
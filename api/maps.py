@@ -0,0 +1,70 @@
+from sqlalchemy import select, func, case
+import models
+from aggregates import aggregates_query
+from versioning import VersionedCache, data_version
+
+map_cache = VersionedCache(data_version, max_entries=256)
+
+
+def _round(value, digits=2):
+    return round(float(value), digits) if value is not None else 0
+
+
+def load_map_overview(db):
+    m = models.Match
+    diff = m.score_blue - m.score_red
+    rows = db.execute(
+        select(
+            m.map,
+            func.count().label("matches"),
+            func.sum(case((diff > 0, 1), else_=0)).label("blue_wins"),
+            func.sum(case((diff < 0, 1), else_=0)).label("red_wins"),
+            func.avg(diff).label("avg_round_diff"),
+            func.avg(func.abs(diff)).label("avg_margin"),
+        )
+        .group_by(m.map)
+        .order_by(func.count().desc())
+    ).mappings().all()
+
+    return [
+        {
+            "map": r["map"],
+            "matches": r["matches"],
+            "blue_wins": r["blue_wins"],
+            "red_wins": r["red_wins"],
+            "blue_winrate": _round(r["blue_wins"] / r["matches"] * 100),
+            "red_winrate": _round(r["red_wins"] / r["matches"] * 100),
+            "avg_round_diff": _round(r["avg_round_diff"]),
+            "avg_margin": _round(r["avg_margin"]),
+        }
+        for r in rows
+    ]
+
+
+def load_player_maps(db, player_id):
+    query = aggregates_query(models.Match.map.label("map")).where(models.MatchPlayer.player_id == player_id)
+    rows = db.execute(query).mappings().all()
+
+    result = [
+        {
+            "map": r["map"],
+            "matches": r["matches"],
+            "wins": r["wins"],
+            "losses": r["losses"],
+            "winrate": _round(r["wins"] / r["matches"] * 100),
+            "kills": r["kills"],
+            "deaths": r["deaths"],
+            "assists": r["assists"],
+            "kd": _round(r["kills"] / max(r["deaths"], 1)),
+        }
+        for r in rows
+    ]
+    return sorted(result, key=lambda r: r["matches"], reverse=True)
+
+
+def get_map_overview(db):
+    return map_cache.get("overview", lambda: load_map_overview(db))
+
+
+def get_player_maps(db, player_id):
+    return map_cache.get(("player", player_id), lambda: load_player_maps(db, player_id))
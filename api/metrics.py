@@ -0,0 +1,195 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "25"))
+# Rotas que legitimamente passam do orçamento padrão. Excluir uma partida
+# ajusta jogadores, buckets, pares, ratings e o log de alterações.
+SQL_ROUTE_BUDGETS = {
+    ("DELETE", "/matches/{match_id}"): 40,
+}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.samples = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.samples += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = defaultdict(int)
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.sql_per_request = defaultdict(lambda: Histogram(SQL_COUNT_BUCKETS))
+        self.sql_seconds = defaultdict(float)
+        self.over_budget = defaultdict(int)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method, route, status, elapsed, stats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, status)] += 1
+            self.latency[key].observe(elapsed)
+            self.sql_per_request[key].observe(stats.statements)
+            self.sql_seconds[key] += stats.sql_seconds
+            if stats.statements > budget_for(method, route):
+                self.over_budget[key] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP http_requests_in_flight Requisições em andamento.",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Requisições por rota e status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += _render_histograms(
+                "http_request_duration_seconds", "Latência das requisições.", self.latency
+            )
+            lines += _render_histograms(
+                "sql_statements_per_request", "Comandos SQL executados por requisição.", self.sql_per_request
+            )
+
+            lines += [
+                "# HELP sql_seconds_total Tempo gasto em SQL por rota.",
+                "# TYPE sql_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'sql_seconds_total{{method="{method}",route="{route}"}} {seconds:.6f}')
+
+            lines += [
+                "# HELP sql_budget_exceeded_total Requisições acima do orçamento de comandos SQL.",
+                "# TYPE sql_budget_exceeded_total counter",
+            ]
+            for (method, route), count in sorted(self.over_budget.items()):
+                lines.append(f'sql_budget_exceeded_total{{method="{method}",route="{route}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(name, help_text, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), h in sorted(histograms.items()):
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip(h.buckets, h.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.samples}')
+        lines.append(f"{name}_sum{{{labels}}} {h.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {h.samples}")
+    return lines
+
+
+registry = Registry()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def install_sql_hooks(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def budget_for(method, route):
+    return SQL_ROUTE_BUDGETS.get((method, route), SQL_QUERY_BUDGET)
+
+
+def _finish(request, status, started, stats):
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    registry.finished(request.method, route_path, status, elapsed, stats)
+    budget = budget_for(request.method, route_path)
+    if stats.statements > budget:
+        logger.warning(
+            f"{request.method} {route_path} executou {stats.statements} comandos SQL "
+            f"({stats.sql_seconds * 1000:.1f} ms em SQL, {elapsed * 1000:.1f} ms no total), "
+            f"acima do orçamento de {budget}"
+        )
+
+
+async def middleware(request, call_next):
+    stats = RequestStats()
+    token = _current.set(stats)
+    registry.started()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _finish(request, 500, started, stats)
+        raise
+    finally:
+        _current.reset(token)
+
+    # O corpo só é enviado depois que o middleware retorna; em rotas com
+    # streaming é ali que estão as consultas. A requisição só é contabilizada
+    # quando o corpo termina.
+    body = response.body_iterator
+
+    async def observed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _finish(request, response.status_code, started, stats)
+
+    response.body_iterator = observed_body()
+    return response
@@ -0,0 +1,52 @@
+import logging
+from sqlalchemy import inspect, text
+import models
+
+logger = logging.getLogger(__name__)
+
+
+def needs_migration(engine):
+    insp = inspect(engine)
+    if "match_players" not in insp.get_table_names():
+        return False
+    columns = {c["name"] for c in insp.get_columns("match_players")}
+    return "player_name" in columns and "player_id" not in columns
+
+
+def migrate(engine):
+    if not needs_migration(engine):
+        return False
+
+    table = models.MatchPlayer.__table__
+    old_indexes = [i["name"] for i in inspect(engine).get_indexes("match_players") if i["name"]]
+
+    with engine.begin() as conn:
+        for name in old_indexes:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        conn.execute(text("ALTER TABLE match_players RENAME TO match_players_old"))
+        table.create(conn)
+        conn.execute(text(
+            "INSERT INTO match_players (id, match_id, player_id, team, kills, deaths, assists) "
+            "SELECT mp.id, mp.match_id, p.id, mp.team, mp.kills, mp.deaths, mp.assists "
+            "FROM match_players_old mp JOIN players p ON p.name = mp.player_name"
+        ))
+        migrated = conn.execute(text("SELECT COUNT(*) FROM match_players")).scalar()
+        orphaned = conn.execute(text("SELECT COUNT(*) FROM match_players_old")).scalar() - migrated
+        conn.execute(text("DROP TABLE match_players_old"))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('match_players', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM match_players), 1))"
+            ))
+
+    logger.info(f"match_players migrado para player_id: {migrated} linhas, {orphaned} sem jogador descartadas")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    from database import engine
+
+    if not migrate(engine):
+        logger.info("Nada a migrar: match_players já usa player_id.")
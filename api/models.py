@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Date, Index
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -30,13 +31,84 @@ class Match(Base):
 
 class MatchPlayer(Base):
     __tablename__ = "match_players"
+    __table_args__ = (
+        Index("ix_match_players_player_match", "player_id", "match_id"),
+        Index("ix_match_players_match_id", "match_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(Integer, ForeignKey("matches.id"))
-    player_name = Column(String, ForeignKey("players.name"))
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
     team = Column(String)
     kills = Column(Integer)
     deaths = Column(Integer)
     assists = Column(Integer)
 
     match = relationship("Match", back_populates="players")
+    player = relationship("Player")
+
+    player_name = association_proxy("player", "name")
+
+class PlayerDailyStats(Base):
+    __tablename__ = "player_daily_stats"
+    __table_args__ = (
+        Index("ix_player_daily_stats_day_map", "day", "map"),
+    )
+
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    map = Column(String, primary_key=True)
+    matches = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    losses = Column(Integer, default=0)
+    kills = Column(Integer, default=0)
+    deaths = Column(Integer, default=0)
+    assists = Column(Integer, default=0)
+    roundsWon = Column(Integer, default=0)
+    roundsLost = Column(Integer, default=0)
+
+class PlayerRating(Base):
+    __tablename__ = "player_ratings"
+
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    rating = Column(Float)
+    matches = Column(Integer, default=0)
+
+class RatingHistory(Base):
+    __tablename__ = "rating_history"
+    __table_args__ = (
+        Index("ix_rating_history_player_match", "player_id", "match_id"),
+        Index("ix_rating_history_match_id", "match_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, ForeignKey("matches.id"))
+    player_id = Column(Integer, ForeignKey("players.id"))
+    rating_before = Column(Float)
+    rating_after = Column(Float)
+
+class PlayerPair(Base):
+    __tablename__ = "player_pairs"
+
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    other_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    wins_with = Column(Integer, default=0)
+    losses_with = Column(Integer, default=0)
+    wins_against = Column(Integer, default=0)
+    losses_against = Column(Integer, default=0)
+
+class IngestTicket(Base):
+    __tablename__ = "ingest_tickets"
+
+    ticket = Column(String, primary_key=True)
+    match_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer)
+    op = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
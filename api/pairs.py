@@ -0,0 +1,155 @@
+import numpy as np
+from sqlalchemy import select, delete, func
+import models
+from database import insert_rows
+
+PAIR_COLUMNS = ["wins_with", "losses_with", "wins_against", "losses_against"]
+REBUILD_CHUNK = 20000
+
+_pair_table = models.PlayerPair.__table__
+
+
+def _upsert_rows(db, rows):
+    insert_rows(
+        db, _pair_table, ["player_id", "other_id", *PAIR_COLUMNS], rows,
+        conflict=["player_id", "other_id"], increment=PAIR_COLUMNS,
+    )
+
+
+def roster_rows(rosters, sign=1):
+    # rosters: [(match_id, date, score_blue, score_red, [(player_id, team), ...]), ...]
+    # Devolve [player_id, other_id, *PAIR_COLUMNS] por par, já somado entre as partidas.
+    rosters = [r for r in rosters if r[4]]
+    if not rosters:
+        return []
+    match_index = np.repeat(np.arange(len(rosters)), [len(roster) for *_, roster in rosters])
+    player_ids = np.fromiter((pid for *_, roster in rosters for pid, _ in roster), dtype=np.int64, count=len(match_index))
+    is_blue = np.fromiter((team == "blue" for *_, roster in rosters for _, team in roster), dtype=bool, count=len(match_index))
+    blue_won = np.fromiter((score_blue > score_red for _, _, score_blue, score_red, _ in rosters), dtype=bool, count=len(rosters))
+
+    players, dense = np.unique(player_ids, return_inverse=True)
+    keys, counts = _pair_keys(match_index, dense, is_blue, blue_won, len(players))
+    return _pair_rows(players, keys, counts * sign)
+
+
+def add_matches(db, rosters):
+    _upsert_rows(db, roster_rows(rosters))
+
+
+def remove_match(db, match, match_players):
+    roster = [(mp.player_id, mp.team) for mp in match_players]
+    _upsert_rows(db, roster_rows([(match.id, match.date, match.score_blue, match.score_red, roster)], sign=-1))
+    player_ids = [player_id for player_id, _ in roster]
+    if player_ids:
+        db.execute(
+            delete(_pair_table).where(
+                _pair_table.c.player_id.in_(player_ids),
+                *[_pair_table.c[c] <= 0 for c in PAIR_COLUMNS],
+            )
+        )
+
+
+def _count_pairs(match_index, player_ids, is_blue, blue_won):
+    # Monta uma matriz (partidas x elenco) com padding para gerar todos os
+    # pares de cada partida de uma vez, sem laço por partida.
+    n_matches = match_index[-1] + 1
+    bounds = np.r_[0, np.flatnonzero(np.diff(match_index)) + 1, len(match_index)]
+    slot = np.arange(len(match_index)) - np.repeat(bounds[:-1], np.diff(bounds))
+    width = int(slot.max()) + 1
+
+    roster = np.full((n_matches, width), -1, dtype=np.int64)
+    team = np.zeros((n_matches, width), dtype=bool)
+    roster[match_index, slot] = player_ids
+    team[match_index, slot] = is_blue
+
+    a, b = roster[:, :, None], roster[:, None, :]
+    valid = (a >= 0) & (b >= 0) & (a != b)
+    same_team = team[:, :, None] == team[:, None, :]
+    won = np.broadcast_to((team == blue_won[:, None])[:, :, None], valid.shape)
+
+    # 0 = vitória junto, 1 = derrota junto, 2 = vitória contra, 3 = derrota contra
+    category = np.where(same_team, 0, 2) + np.where(won, 0, 1)
+    pair_a = np.broadcast_to(a, valid.shape)[valid]
+    pair_b = np.broadcast_to(b, valid.shape)[valid]
+    return pair_a, pair_b, category[valid]
+
+
+def _pair_keys(match_index, dense_ids, is_blue, blue_won, n_players):
+    # Os ids viram índices densos (0..n-1) para a chave do par caber em int64
+    pair_a, pair_b, category = _count_pairs(match_index, dense_ids, is_blue, blue_won)
+    return np.unique((pair_a * n_players + pair_b) * 4 + category, return_counts=True)
+
+
+def _pair_rows(players, keys, counts):
+    category = keys % 4
+    unique_pairs, pair_index = np.unique(keys // 4, return_inverse=True)
+    matrix = np.zeros((len(unique_pairs), 4), dtype=np.int64)
+    matrix[pair_index, category] = counts
+    n_players = len(players)
+    return np.column_stack([
+        players[unique_pairs // n_players], players[unique_pairs % n_players], matrix,
+    ]).tolist()
+
+
+def rebuild(db):
+    mp = models.MatchPlayer
+    m = models.Match
+    rows = db.execute(
+        select(mp.match_id, mp.player_id, mp.team, m.score_blue > m.score_red)
+        .join(m, m.id == mp.match_id)
+        .order_by(mp.match_id)
+    ).all()
+    db.execute(delete(_pair_table))
+    if not rows:
+        return 0
+
+    match_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    player_ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    is_blue = np.fromiter((r[2] == "blue" for r in rows), dtype=bool, count=len(rows))
+    _, match_index = np.unique(match_ids, return_inverse=True)
+    starts = np.r_[0, np.flatnonzero(np.diff(match_index)) + 1]
+    blue_won = np.fromiter((bool(rows[i][3]) for i in starts), dtype=bool, count=len(starts))
+    players, dense = np.unique(player_ids, return_inverse=True)
+
+    keys = []
+    counts = []
+    for first in range(0, len(starts), REBUILD_CHUNK):
+        lo = starts[first]
+        hi = starts[first + REBUILD_CHUNK] if first + REBUILD_CHUNK < len(starts) else len(rows)
+        chunk_keys, chunk_counts = _pair_keys(
+            match_index[lo:hi] - match_index[lo], dense[lo:hi], is_blue[lo:hi],
+            blue_won[first:first + REBUILD_CHUNK], len(players),
+        )
+        keys.append(chunk_keys)
+        counts.append(chunk_counts)
+
+    all_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+    pair_rows = _pair_rows(players, all_keys, totals)
+    insert_rows(db, _pair_table, ["player_id", "other_id", *PAIR_COLUMNS], pair_rows)
+    return len(pair_rows)
+
+
+def backfill_if_empty(db):
+    if db.scalar(select(func.count()).select_from(_pair_table)):
+        return False
+    if not db.scalar(select(func.count()).select_from(models.MatchPlayer)):
+        return False
+    rebuild(db)
+    db.commit()
+    return True
+
+
+def synergy_query(player_id):
+    t = _pair_table
+    return (
+        select(models.Player.name, *[t.c[c] for c in PAIR_COLUMNS])
+        .join(models.Player, models.Player.id == t.c.other_id)
+        .where(t.c.player_id == player_id)
+        .order_by((t.c.wins_with + t.c.losses_with).desc(), t.c.wins_with.desc())
+    )
+
+
+def pair_query(player_id, other_id):
+    t = _pair_table
+    return select(*[t.c[c] for c in PAIR_COLUMNS]).where(t.c.player_id == player_id, t.c.other_id == other_id)
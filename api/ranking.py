@@ -0,0 +1,79 @@
+import numpy as np
+from sqlalchemy import select
+import models
+import rollups
+from versioning import VersionedCache, data_version
+
+MIN_MATCHES = 3
+MAX_CACHED_WINDOWS = 64
+
+LEADERBOARD_FIELDS = [
+    "rank", "name", "ranking_points", "matches", "kills", "assists", "deaths",
+    "wins", "losses", "kd", "winrate", "roundsWon", "roundsLost", "saldo", "form",
+]
+STAT_COLUMNS = ["matches", "wins", "losses", "kills", "deaths", "assists", "roundsWon", "roundsLost"]
+
+
+def compute_leaderboard(rows, min_matches=MIN_MATCHES):
+    if not rows:
+        return []
+
+    names = np.array([r[0] for r in rows], dtype=object)
+    stats = np.array([r[1:] for r in rows], dtype=np.int64).reshape(len(rows), len(STAT_COLUMNS))
+    matches, wins, losses, kills, deaths, assists, rounds_won, rounds_lost = stats.T
+
+    keep = matches >= min_matches
+    names, matches, wins, losses = names[keep], matches[keep], wins[keep], losses[keep]
+    kills, deaths, assists = kills[keep], deaths[keep], assists[keep]
+    rounds_won, rounds_lost = rounds_won[keep], rounds_lost[keep]
+
+    # Sem mortes o K/D passa a ser o próprio número de kills (evita inf no JSON)
+    kd = np.round(kills / np.maximum(deaths, 1), 2)
+    winrate = np.round(wins / np.maximum(matches, 1) * 100, 2)
+    saldo = rounds_won - rounds_lost
+    points = np.round(
+        kills * 2 + assists + wins * 7 + kd * 10 + winrate * 0.5 - deaths * 2 - losses * 7,
+        1,
+    )
+
+    order = np.argsort(-points, kind="stable")
+
+    return [
+        {
+            "rank": rank,
+            "name": names[i],
+            "ranking_points": float(points[i]),
+            "matches": int(matches[i]),
+            "kills": int(kills[i]),
+            "assists": int(assists[i]),
+            "deaths": int(deaths[i]),
+            "wins": int(wins[i]),
+            "losses": int(losses[i]),
+            "kd": float(kd[i]),
+            "winrate": float(winrate[i]),
+            "roundsWon": int(rounds_won[i]),
+            "roundsLost": int(rounds_lost[i]),
+            "saldo": int(saldo[i]),
+        }
+        for rank, i in enumerate(order, start=1)
+    ]
+
+
+def load_leaderboard(db, min_matches=MIN_MATCHES, date_from=None, date_to=None):
+    if date_from is None and date_to is None:
+        columns = [models.Player.name] + [getattr(models.Player, c) for c in STAT_COLUMNS]
+        query = select(*columns).order_by(models.Player.id)
+    else:
+        query = rollups.window_query(date_from, date_to, columns=STAT_COLUMNS)
+    rows = db.execute(query).all()
+    return compute_leaderboard([(r[0],) + tuple(v or 0 for v in r[1:]) for r in rows], min_matches)
+
+
+leaderboard_cache = VersionedCache(data_version, max_entries=MAX_CACHED_WINDOWS)
+
+
+def get_leaderboard(db, min_matches=MIN_MATCHES, date_from=None, date_to=None):
+    return leaderboard_cache.get(
+        (min_matches, date_from, date_to),
+        lambda: load_leaderboard(db, min_matches, date_from, date_to),
+    )
@@ -0,0 +1,224 @@
+import numpy as np
+from sqlalchemy import select, delete, func, tuple_
+import models
+from database import upsert, insert_rows
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+_rating_table = models.PlayerRating.__table__
+_history_table = models.RatingHistory.__table__
+
+
+def simulate(ratings, player_index, is_blue, blue_won, bounds):
+    # As partidas são sequenciais (cada uma depende das anteriores); o que não
+    # depende da ordem (pesos dos times, sinais) é calculado de uma vez.
+    match_of_row = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    n_blue = np.add.reduceat(is_blue.astype(np.int64), bounds[:-1])
+    n_red = np.diff(bounds) - n_blue
+    playable = (n_blue > 0) & (n_red > 0)
+
+    sign = np.where(is_blue, 1.0, -1.0)
+    with np.errstate(divide="ignore"):
+        weight = np.where(is_blue, 1.0 / n_blue[match_of_row], -1.0 / n_red[match_of_row])
+
+    before = np.empty(len(player_index))
+    deltas = np.zeros(len(bounds) - 1)
+    for g in range(len(deltas)):
+        s, e = bounds[g], bounds[g + 1]
+        idx = player_index[s:e]
+        r = ratings[idx]
+        before[s:e] = r
+        # Partidas sem adversário não alteram o rating
+        if not playable[g]:
+            continue
+        expected = 1.0 / (1.0 + 10.0 ** (-r.dot(weight[s:e]) / 400.0))
+        delta = K_FACTOR * (blue_won[g] - expected)
+        ratings[idx] = r + delta * sign[s:e]
+        deltas[g] = delta
+
+    return before, before + deltas[match_of_row] * sign
+
+
+def _run(db, match_ids, player_ids, teams, scores_blue, scores_red, state):
+    if len(match_ids) == 0:
+        return {}
+
+    # As linhas chegam em ordem cronológica (data, id da partida)
+    match_ids = np.asarray(match_ids, dtype=np.int64)
+    player_ids = np.asarray(player_ids, dtype=np.int64)
+    is_blue = np.asarray(teams, dtype=object) == "blue"
+    scores_blue = np.asarray(scores_blue, dtype=np.int64)
+    scores_red = np.asarray(scores_red, dtype=np.int64)
+
+    known = np.fromiter(state.keys(), dtype=np.int64, count=len(state))
+    unique_players, player_index = np.unique(np.concatenate([known, player_ids]), return_inverse=True)
+    player_index = player_index[len(known):]
+
+    ratings = np.full(len(unique_players), INITIAL_RATING)
+    counts = np.zeros(len(unique_players), dtype=np.int64)
+    for i, pid in enumerate(unique_players):
+        if pid in state:
+            ratings[i], counts[i] = state[pid]
+
+    bounds = np.r_[0, np.flatnonzero(np.diff(match_ids)) + 1, len(match_ids)]
+    starts = bounds[:-1]
+    blue_won = (scores_blue[starts] > scores_red[starts]).astype(np.float64)
+
+    before, after = simulate(ratings, player_index, is_blue, blue_won, bounds)
+    counts += np.bincount(player_index, minlength=len(unique_players))
+
+    insert_rows(
+        db, _history_table, ["match_id", "player_id", "rating_before", "rating_after"],
+        zip(match_ids.tolist(), player_ids.tolist(), before.tolist(), after.tolist()),
+    )
+
+    touched = np.unique(player_index)
+    return {int(unique_players[i]): (float(ratings[i]), int(counts[i])) for i in touched}
+
+
+def _store_ratings(db, state):
+    if not state:
+        return
+    stmt = upsert(db, _rating_table)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[_rating_table.c.player_id],
+            set_={"rating": stmt.excluded.rating, "matches": stmt.excluded.matches},
+        ),
+        [{"player_id": pid, "rating": rating, "matches": matches} for pid, (rating, matches) in state.items()],
+    )
+
+
+def _load_state(db, player_ids):
+    rows = db.execute(
+        select(_rating_table.c.player_id, _rating_table.c.rating, _rating_table.c.matches)
+        .where(_rating_table.c.player_id.in_(set(player_ids)))
+    ).all()
+    return {pid: (rating, matches or 0) for pid, rating, matches in rows}
+
+
+def apply_matches(db, matches):
+    # matches: [(match_id, date, score_blue, score_red, [(player_id, team), ...]), ...]
+    matches = sorted((m for m in matches if m[4]), key=lambda m: (m[1], m[0]))
+    if not matches:
+        return
+
+    # Partida retroativa: tudo o que veio depois dela precisa ser recalculado
+    first_id, first_date = matches[0][0], matches[0][1]
+    first_new_id = min(m[0] for m in matches)
+    later = db.scalar(
+        select(models.Match.id)
+        .where(models.Match.date > first_date, models.Match.id < first_new_id)
+        .limit(1)
+    )
+    if later is not None:
+        replay(db, since=(first_date, first_id))
+        return
+
+    rows = [
+        (match_id, player_id, team, score_blue, score_red)
+        for match_id, _, score_blue, score_red, roster in matches
+        for player_id, team in roster
+    ]
+    match_ids, player_ids, teams, scores_blue, scores_red = zip(*rows)
+    state = _load_state(db, player_ids)
+    _store_ratings(db, _run(db, match_ids, player_ids, teams, scores_blue, scores_red, state))
+
+
+def _since(since):
+    return tuple_(models.Match.date, models.Match.id) >= tuple_(*since)
+
+
+def _rollback_from(db, since):
+    rows = db.execute(
+        select(_history_table.c.player_id, _history_table.c.rating_before)
+        .join(models.Match, models.Match.id == _history_table.c.match_id)
+        .where(_since(since))
+        .order_by(models.Match.date, models.Match.id, _history_table.c.id)
+    ).all()
+    earliest = {}
+    replayed = {}
+    for player_id, rating_before in rows:
+        earliest.setdefault(player_id, rating_before)
+        replayed[player_id] = replayed.get(player_id, 0) + 1
+
+    state = _load_state(db, earliest)
+    for player_id, rating in earliest.items():
+        matches = state.get(player_id, (rating, 0))[1] - replayed[player_id]
+        state[player_id] = (rating, max(0, matches))
+
+    db.execute(
+        delete(_history_table)
+        .where(_history_table.c.match_id.in_(select(models.Match.id).where(_since(since))))
+    )
+    return state
+
+
+def replay(db, since=None):
+    # since: (data, match_id) da primeira partida a recalcular; None refaz tudo
+    if since is None:
+        db.execute(delete(_history_table))
+        db.execute(delete(_rating_table))
+        # Sem os índices o histórico inteiro entra bem mais rápido; eles são
+        # recriados de uma vez no final, dentro da mesma transação
+        for index in _history_table.indexes:
+            index.drop(db.connection())
+        state = {}
+    else:
+        state = _rollback_from(db, since)
+    db.flush()
+
+    mp = models.MatchPlayer
+    m = models.Match
+    query = select(mp.match_id, mp.player_id, mp.team, m.score_blue, m.score_red).join(m, m.id == mp.match_id)
+    if since is not None:
+        query = query.where(_since(since))
+    rows = db.execute(query.order_by(m.date, m.id, mp.id)).all()
+
+    if rows:
+        match_ids, player_ids, teams, scores_blue, scores_red = zip(*rows)
+        known = _load_state(db, set(player_ids) - set(state))
+        known.update(state)
+        state = known
+        state.update(_run(db, match_ids, player_ids, teams, scores_blue, scores_red, state))
+
+    if since is None:
+        for index in _history_table.indexes:
+            index.create(db.connection())
+
+    # Inclui quem só tinha partidas removidas, que volta ao rating anterior
+    _store_ratings(db, state)
+    return len(set(r[0] for r in rows)) if rows else 0
+
+
+def backfill_if_empty(db):
+    if db.scalar(select(func.count()).select_from(_rating_table)):
+        return False
+    if not db.scalar(select(func.count()).select_from(models.MatchPlayer)):
+        return False
+    replay(db)
+    db.commit()
+    return True
+
+
+def leaderboard_query():
+    return (
+        select(models.Player.name, _rating_table.c.rating, _rating_table.c.matches)
+        .join(models.Player, models.Player.id == _rating_table.c.player_id)
+        .order_by(_rating_table.c.rating.desc())
+    )
+
+
+def history_query(player_id):
+    return (
+        select(
+            _history_table.c.match_id,
+            models.Match.date,
+            _history_table.c.rating_before,
+            _history_table.c.rating_after,
+        )
+        .join(models.Match, models.Match.id == _history_table.c.match_id)
+        .where(_history_table.c.player_id == player_id)
+        .order_by(models.Match.date.desc(), models.Match.id.desc())
+    )
@@ -0,0 +1,26 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def fast_json(content, response=None):
+    # Devolver a Response pronta evita o jsonable_encoder do FastAPI; os
+    # cabeçalhos já definidos na resposta da rota (ETag etc.) são copiados.
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(content, headers=headers)
+
+
+def parse_fields(fields, allowed):
+    if not fields:
+        return list(allowed), []
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    return requested, unknown
+
+
+def rows_to_dicts(keys, rows):
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,49 @@
+from sqlalchemy import select, insert, delete, func, cast, Date
+import models
+from aggregates import aggregates_query
+from ingest import DELTA_COLUMNS
+
+_bucket_table = models.PlayerDailyStats.__table__
+
+
+def day_expression(dialect_name):
+    if dialect_name == "sqlite":
+        return func.date(models.Match.date)
+    return cast(models.Match.date, Date)
+
+
+def rebuild(db):
+    day = day_expression(db.get_bind().dialect.name).label("day")
+    db.execute(delete(_bucket_table))
+    db.execute(
+        insert(_bucket_table).from_select(
+            ["player_id", "day", "map", *DELTA_COLUMNS],
+            aggregates_query(day, models.Match.map.label("map")),
+        )
+    )
+
+
+def backfill_if_empty(db):
+    if db.scalar(select(func.count()).select_from(_bucket_table)):
+        return False
+    if not db.scalar(select(func.count()).select_from(models.MatchPlayer)):
+        return False
+    rebuild(db)
+    db.commit()
+    return True
+
+
+def window_query(date_from=None, date_to=None, map_name=None, columns=DELTA_COLUMNS):
+    t = _bucket_table
+    query = (
+        select(models.Player.name, *[func.sum(t.c[c]).label(c) for c in columns])
+        .join(models.Player, models.Player.id == t.c.player_id)
+        .group_by(t.c.player_id, models.Player.name)
+    )
+    if date_from is not None:
+        query = query.where(t.c.day >= date_from)
+    if date_to is not None:
+        query = query.where(t.c.day <= date_to)
+    if map_name is not None:
+        query = query.where(t.c.map == map_name)
+    return query
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 class LoginRequest(BaseModel):
@@ -42,6 +42,7 @@ class MatchCreate(BaseModel):
     map: str
     score_blue: int
     score_red: int
+    date: Optional[datetime] = None
     players: List[MatchPlayerBase]
 
 class MatchOut(BaseModel):
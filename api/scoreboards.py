@@ -0,0 +1,69 @@
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from database import AsyncSessionLocal
+import models
+
+MAX_IDS = 1000
+MAX_RECENT = 100
+STREAM_CHUNK = 100
+
+
+def scoreboard_query():
+    # Duas consultas no total: as partidas e, via selectin, os jogadores de
+    # todas elas já com o nome (join em players dentro do mesmo SELECT).
+    return select(models.Match).options(
+        selectinload(models.Match.players).joinedload(models.MatchPlayer.player)
+    )
+
+
+def serialize(match):
+    return {
+        "id": match.id,
+        "date": match.date,
+        "map": match.map,
+        "score": {
+            "blue": match.score_blue,
+            "red": match.score_red
+        },
+        "players": [
+            {
+                "player_name": mp.player.name if mp.player else None,
+                "team": mp.team,
+                "kills": mp.kills,
+                "deaths": mp.deaths,
+                "assists": mp.assists
+            }
+            for mp in match.players
+        ]
+    }
+
+
+def parse_ids(raw):
+    ids = [int(part) for part in raw.split(",") if part.strip()]
+    return list(dict.fromkeys(ids))
+
+
+async def load_by_ids(db, ids):
+    matches = (await db.scalars(scoreboard_query().where(models.Match.id.in_(ids)))).all()
+    by_id = {m.id: m for m in matches}
+    return [serialize(by_id[match_id]) for match_id in ids if match_id in by_id]
+
+
+async def load_recent(db, limit):
+    matches = (await db.scalars(scoreboard_query().order_by(models.Match.id.desc()).limit(limit))).all()
+    return [serialize(m) for m in matches]
+
+
+async def stream_by_ids(ids):
+    # Listas grandes saem como um array JSON montado em blocos, cada bloco
+    # com suas duas consultas, sem juntar tudo em memória.
+    async with AsyncSessionLocal() as db:
+        yield b"["
+        first = True
+        for start in range(0, len(ids), STREAM_CHUNK):
+            for item in await load_by_ids(db, ids[start:start + STREAM_CHUNK]):
+                yield (b"" if first else b",") + orjson.dumps(item)
+                first = False
+            db.expunge_all()
+        yield b"]"
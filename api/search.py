@@ -0,0 +1,63 @@
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from sqlalchemy import select
+import models
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    # "Arranha-Céu" e "arranha-ceu" viram a mesma chave
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+class NameIndex:
+    # Lista ordenada de (chave normalizada, nome); a busca por prefixo é um
+    # bisect seguido de uma varredura curta.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+
+    def _ensure_loaded(self, db):
+        if self._keys is not None:
+            return
+        # Carrega sob o lock para que um add() concorrente não se perca
+        with self._lock:
+            if self._keys is None:
+                names = db.scalars(select(models.Player.name)).all()
+                self._keys = sorted((normalize(name), name) for name in names)
+
+    def add(self, name):
+        with self._lock:
+            if self._keys is not None:
+                insort(self._keys, (normalize(name), name))
+
+    def remove(self, name):
+        with self._lock:
+            if self._keys is None:
+                return
+            key = (normalize(name), name)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def rename(self, old_name, new_name):
+        self.remove(old_name)
+        self.add(new_name)
+
+    def search(self, db, query, limit=DEFAULT_LIMIT):
+        self._ensure_loaded(db)
+        prefix = normalize(query)
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            result = []
+            while i < len(self._keys) and len(result) < limit and self._keys[i][0].startswith(prefix):
+                result.append(self._keys[i][1])
+                i += 1
+        return result
+
+
+name_index = NameIndex()
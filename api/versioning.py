@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Response
+
+
+class DataVersion:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Muda a cada boot, para que ETags de um processo anterior nunca coincidam
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._modified = time.time()
+
+    @property
+    def current(self):
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+            self._modified = time.time()
+            return self._version
+
+    def validators(self):
+        with self._lock:
+            version, modified = self._version, self._modified
+        return {
+            "ETag": f'W/"{self._boot_id}-{version}"',
+            "Last-Modified": formatdate(modified, usegmt=True),
+        }
+
+    def is_fresh(self, request, validators):
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or validators["ETag"] in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+                return since >= parsedate_to_datetime(validators["Last-Modified"])
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def conditional(self, request, response):
+        validators = self.validators()
+        if self.is_fresh(request, validators):
+            return Response(status_code=304, headers=validators)
+        response.headers.update(validators)
+        return None
+
+
+class VersionedCache:
+    def __init__(self, data_version, max_entries=64):
+        self._data_version = data_version
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+        self._version = data_version.current
+
+    def get(self, key, loader):
+        with self._lock:
+            version = self._data_version.current
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                return self._entries[key]
+            # Requisições simultâneas pela mesma chave esperam a primeira carga
+            # em vez de repetir a consulta
+            pending = self._loading.get((version, key))
+            owner = pending is None
+            if owner:
+                pending = self._loading[(version, key)] = _PendingLoad()
+
+        if not owner:
+            return pending.wait()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            pending.fail(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop((version, key), None)
+
+        with self._lock:
+            if version == self._version == self._data_version.current:
+                if len(self._entries) >= self._max_entries:
+                    self._entries.clear()
+                self._entries[key] = value
+        pending.done(value)
+        return value
+
+
+class _PendingLoad:
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def done(self, value):
+        self._value = value
+        self._event.set()
+
+    def fail(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+data_version = DataVersion()
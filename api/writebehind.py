@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import select, insert
+from database import SessionLocal
+from versioning import data_version
+import models, schemas, ingest, events
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+JOURNAL_PATH = os.getenv("WRITE_BEHIND_JOURNAL", "./pending_matches.jsonl")
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH", str(ingest.DEFAULT_BATCH_SIZE)))
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5"))
+
+_ticket_table = models.IngestTicket.__table__
+
+
+class MatchQueue:
+    # Fila de partidas aceitas mas ainda não gravadas. Cada entrada vai para o
+    # journal (JSONL, com fsync) antes de a rota responder; o worker grava em
+    # lotes e registra o ticket na mesma transação da partida, então um
+    # replay após queda nunca duplica partidas.
+    def __init__(self, journal_path=JOURNAL_PATH, batch_size=BATCH_SIZE):
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._inflight = {}
+        self._failed = OrderedDict()
+        self._thread = None
+
+    def _write(self, records):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append(self, records):
+        with self._journal_lock:
+            self._write(records)
+
+    def _compact(self):
+        # O journal é reescrito só com o que ainda falta gravar. Quem enfileira
+        # segura o mesmo lock até a entrada estar na memória, então nenhuma
+        # partida fica de fora do arquivo novo.
+        with self._journal_lock:
+            with self._cond:
+                entries = [*self._failed.items(), *self._inflight.items(), *self._pending.items()]
+            tmp_path = f"{self.journal_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for ticket, (queued_at, data, *_) in entries:
+                    f.write(json.dumps(_enqueue_record(ticket, queued_at, data), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def recover(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        entries = OrderedDict()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Última linha cortada por uma queda no meio da escrita
+                    logger.warning("Linha inválida ignorada no journal de partidas")
+                    continue
+                if record["op"] == "enqueue":
+                    entries[record["ticket"]] = (record["queued_at"], schemas.MatchCreate.model_validate(record["data"]))
+                elif record["op"] == "done":
+                    for ticket in record["tickets"]:
+                        entries.pop(ticket, None)
+
+        if entries:
+            with SessionLocal() as db:
+                stored = set(db.scalars(select(_ticket_table.c.ticket).where(_ticket_table.c.ticket.in_(list(entries)))))
+            for ticket in stored:
+                entries.pop(ticket)
+
+        with self._cond:
+            self._pending.update(entries)
+        self._compact()
+        if entries:
+            logger.info(f"{len(entries)} partidas pendentes recuperadas do journal")
+        return len(entries)
+
+    def enqueue(self, data):
+        if data.date is None:
+            data = data.model_copy(update={"date": datetime.utcnow()})
+        ticket = uuid.uuid4().hex
+        queued_at = datetime.utcnow().isoformat()
+        with self._journal_lock:
+            self._write([_enqueue_record(ticket, queued_at, data)])
+            with self._cond:
+                self._pending[ticket] = (queued_at, data)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+        return ticket
+
+    def _take_batch(self):
+        with self._cond:
+            if len(self._pending) < self.batch_size:
+                self._cond.wait(FLUSH_INTERVAL)
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                ticket, entry = self._pending.popitem(last=False)
+                self._inflight[ticket] = entry
+                batch.append((ticket, entry[1]))
+            return batch
+
+    def _ingest(self, batch):
+        db = SessionLocal()
+        try:
+            results = ingest.ingest_matches(db, [data for _, data in batch])
+            db.execute(
+                insert(_ticket_table),
+                [{"ticket": ticket, "match_id": r["match_id"]} for (ticket, _), r in zip(batch, results)]
+            )
+            db.commit()
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def drain_once(self):
+        batch = self._take_batch()
+        if not batch:
+            return 0
+
+        imported = []
+        failed = {}
+        try:
+            imported = list(zip(batch, self._ingest(batch)))
+        except Exception as e:
+            # Isola a partida problemática gravando o lote uma a uma
+            logger.error(f"Erro ao gravar lote de {len(batch)} partidas; tentando individualmente: {e}", exc_info=True)
+            for item in batch:
+                try:
+                    imported.append((item, self._ingest([item])[0]))
+                except Exception as item_error:
+                    logger.error(f"Erro ao gravar partida do ticket {item[0]}: {item_error}", exc_info=True)
+                    failed[item[0]] = str(item_error)
+
+        # Falhas continuam no journal e são tentadas de novo no próximo boot
+        if imported:
+            self._append([{"op": "done", "tickets": [ticket for (ticket, _), _ in imported]}])
+        with self._cond:
+            for ticket, _ in batch:
+                entry = self._inflight.pop(ticket, None)
+                if ticket in failed and entry is not None:
+                    self._failed[ticket] = (*entry, failed[ticket])
+            idle = not self._pending and not self._inflight
+        if idle:
+            self._compact()
+
+        if imported:
+            events.publish_matches(data_version.bump(), [(data, r) for (_, data), r in imported])
+        return len(batch)
+
+    def _run(self):
+        while True:
+            try:
+                self.drain_once()
+            except Exception as e:
+                logger.error(f"Erro no worker de gravação de partidas: {e}", exc_info=True)
+
+    def start(self):
+        self.recover()
+        self._thread = threading.Thread(target=self._run, name="match-write-behind", daemon=True)
+        self._thread.start()
+
+    def status(self, ticket=None, limit=100):
+        with self._cond:
+            queued = [*self._inflight.items(), *self._pending.items()]
+            failed = {t: error for t, (_, _, error) in self._failed.items()}
+        if ticket is None:
+            return {
+                "pending": len(queued),
+                "oldest_queued_at": queued[0][1][0] if queued else None,
+                "tickets": [{"ticket": t, "queued_at": queued_at} for t, (queued_at, _) in queued[:limit]],
+                "failed": [{"ticket": t, "error": error} for t, error in failed.items()],
+            }
+
+        if any(t == ticket for t, _ in queued):
+            return {"ticket": ticket, "status": "pending"}
+        if ticket in failed:
+            return {"ticket": ticket, "status": "failed", "error": failed[ticket]}
+        with SessionLocal() as db:
+            match_id = db.scalar(select(_ticket_table.c.match_id).where(_ticket_table.c.ticket == ticket))
+        if match_id is not None:
+            return {"ticket": ticket, "status": "done", "match_id": match_id}
+        return {"ticket": ticket, "status": "unknown"}
+
+
+def _enqueue_record(ticket, queued_at, data):
+    return {"op": "enqueue", "ticket": ticket, "queued_at": queued_at, "data": data.model_dump(mode="json")}
+
+
+queue = MatchQueue()
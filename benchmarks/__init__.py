@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
@@ -0,0 +1,86 @@
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+MAPS = [
+    "Café Dostoyevsky", "Consulado", "Clube", "Fronteira", "Litoral", "Chalé",
+    "Covil", "Laboratórios Nighthaven", "Planíce Esmeralda", "Banco", "Canal",
+    "Oregon", "Outback", "Arranha-Céu", "Parque Temático", "Mansão"
+]
+
+
+def synthetic_players(n_players):
+    return [f"player_{i:05d}" for i in range(n_players)]
+
+
+def synthetic_match(rng, names, skill, date):
+    import schemas
+
+    roster = rng.sample(names, 10)
+    blue, red = roster[:5], roster[5:]
+    edge = sum(skill[n] for n in blue) - sum(skill[n] for n in red)
+    blue_wins = rng.random() < 1 / (1 + math.exp(-edge / 2))
+    loser_score = rng.randint(0, 6)
+    score_blue, score_red = (7, loser_score) if blue_wins else (loser_score, 7)
+
+    players = []
+    for i, name in enumerate(roster):
+        players.append({
+            "player_name": name,
+            "team": "blue" if i < 5 else "red",
+            "kills": max(0, round(rng.gauss(8 + 2 * skill[name], 3))),
+            "deaths": max(0, round(rng.gauss(8 - skill[name], 3))),
+            "assists": max(0, round(rng.gauss(3, 2))),
+        })
+    return schemas.MatchCreate(map=rng.choice(MAPS), score_blue=score_blue, score_red=score_red, date=date, players=players)
+
+
+def generate(n_players, n_matches, days=180, seed=42, batch_size=1000):
+    import models, ingest
+    from database import SessionLocal, engine
+
+    rng = random.Random(seed)
+    names = synthetic_players(n_players)
+    skill = {name: rng.gauss(0, 1) for name in names}
+    start = datetime.utcnow() - timedelta(days=days)
+    step = timedelta(days=days) / max(n_matches, 1)
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([models.Player(name=name) for name in names])
+        db.commit()
+
+        for first in range(0, n_matches, batch_size):
+            batch = [
+                synthetic_match(rng, names, skill, start + step * i)
+                for i in range(first, min(first + batch_size, n_matches))
+            ]
+            ingest.ingest_matches(db, batch)
+            db.commit()
+    finally:
+        db.close()
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um banco sintético de partidas 5v5.")
+    parser.add_argument("--db", required=True, help="caminho do arquivo SQLite a ser criado")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--matches", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} já existe")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    if not __package__:
+        # Rodando como script (python benchmarks/generate.py) o pacote
+        # benchmarks, que coloca api/ no sys.path, não foi importado
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+    generate(args.players, args.matches, args.days, args.seed)
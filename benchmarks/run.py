@@ -0,0 +1,162 @@
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.generate import generate, synthetic_match
+
+DEFAULT_SCALES = "200x1000,1000x10000,2000x50000"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _summarize(latencies, statements, elapsed):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "sql_per_request": round(float(np.mean(statements)), 2),
+    }
+
+
+def run_scale(n_players, n_matches, n_requests, seed=42):
+    # Precisa ser chamado num processo novo: DATABASE_URL já deve estar definido
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+
+    names = generate(n_players, n_matches, seed=seed)
+
+    import main
+    from database import engine, async_engine
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    statement_count = [0]
+
+    def count_statement(*args):
+        statement_count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    rng = random.Random(seed)
+    skill = {name: 0.0 for name in names}
+    created = []
+
+    routes = {
+        "get_players": lambda c: c.get("/players"),
+        "get_player_matches": lambda c: c.get(f"/players/{rng.choice(names)}/matches"),
+        "get_match": lambda c: c.get(f"/matches/{rng.randint(1, n_matches)}"),
+        "admin_overview": lambda c: c.get("/admin/overview"),
+        "get_leaderboard": lambda c: c.get("/leaderboard"),
+        "create_match": lambda c: created.append(c.post(
+            "/matches",
+            content=synthetic_match(rng, names, skill, datetime.utcnow()).model_dump_json(),
+            headers={"Content-Type": "application/json"},
+        ).json()["match_id"]),
+        "delete_match": lambda c: c.delete(f"/matches/{created.pop()}"),
+    }
+
+    results = {}
+    with TestClient(main.app) as client:
+        for name, call in routes.items():
+            latencies = []
+            statements = []
+            started = time.perf_counter()
+            for _ in range(n_requests):
+                statement_count[0] = 0
+                t0 = time.perf_counter()
+                call(client)
+                latencies.append(time.perf_counter() - t0)
+                statements.append(statement_count[0])
+            results[name] = _summarize(latencies, statements, time.perf_counter() - started)
+    return results
+
+
+def _run_in_subprocess(n_players, n_matches, n_requests, seed, workdir):
+    db_path = Path(workdir) / f"bench_{n_players}x{n_matches}.db"
+    out_path = Path(workdir) / f"bench_{n_players}x{n_matches}.json"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.run", "--single",
+            "--players", str(n_players), "--matches", str(n_matches),
+            "--requests", str(n_requests), "--seed", str(seed), "--output", str(out_path),
+        ],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        check=True,
+    )
+    return json.loads(out_path.read_text())
+
+
+def _compare(current, previous):
+    lines = []
+    for scale, routes in current["scales"].items():
+        for route, stats in routes.items():
+            before = previous.get("scales", {}).get(scale, {}).get(route)
+            if not before:
+                continue
+            change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+            lines.append(f"{scale:>14} {route:<20} p95 {before['p95_ms']:>9.3f} -> {stats['p95_ms']:>9.3f} ms ({change:+.1f}%)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das rotas da API sobre bancos sintéticos.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="lista jogadoresxpartidas, ex.: 200x1000,1000x10000")
+    parser.add_argument("--players", type=int)
+    parser.add_argument("--matches", type=int)
+    parser.add_argument("--requests", type=int, default=200, help="requisições por rota")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="arquivo JSON de saída")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        results = run_scale(args.players, args.matches, args.requests, args.seed)
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        return
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "requests_per_route": args.requests,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales.split(","):
+            n_players, n_matches = (int(v) for v in scale.lower().split("x"))
+            print(f"Executando escala {n_players} jogadores x {n_matches} partidas...", flush=True)
+            report["scales"][scale] = _run_in_subprocess(n_players, n_matches, args.requests, args.seed, workdir)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"bench-{report['timestamp'].replace(':', '')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados salvos em {output}")
+
+    for scale, routes in report["scales"].items():
+        for route, stats in routes.items():
+            print(
+                f"{scale:>14} {route:<20} {stats['throughput_rps']:>8} req/s  "
+                f"p50 {stats['p50_ms']:>8.3f}  p95 {stats['p95_ms']:>8.3f}  p99 {stats['p99_ms']:>8.3f} ms  "
+                f"sql/req {stats['sql_per_request']}"
+            )
+
+    if args.compare:
+        print(_compare(report, json.loads(Path(args.compare).read_text())))
+
+
+if __name__ == "__main__":
+    main()
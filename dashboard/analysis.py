@@ -0,0 +1,22 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import requests
+
+API_URL = "https://fpl-dashboard-41md.onrender.com"
+
+
+def read_match_players(since=None, api_url=API_URL, session=None):
+    # Lê o stream Arrow de /export/match_players direto para um DataFrame,
+    # lote a lote, sem passar por JSON.
+    http = session or requests.Session()
+    params = {"format": "arrow"}
+    if since is not None:
+        params["since"] = pd.Timestamp(since).isoformat()
+    with http.get(f"{api_url}/export/match_players", params=params, stream=True) as res:
+        res.raise_for_status()
+        if not res.headers.get("content-type", "").startswith("application/vnd.apache.arrow"):
+            raise RuntimeError(res.json().get("error", "Resposta inesperada da exportação"))
+        res.raw.decode_content = True
+        table = pa.ipc.open_stream(res.raw).read_all()
+    return table.to_pandas()
@@ -1,16 +1,50 @@
 import streamlit as st
 import pandas as pd
 import requests
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from requests.adapters import HTTPAdapter
 
 API_URL = "https://fpl-dashboard-41md.onrender.com"
+CACHE_TTL = 60
+VALIDATOR_CACHE_SIZE = 256
+HISTORY_PAGE_SIZE = 20
+PREFETCH_PLAYERS = 10
+PREFETCH_WORKERS = 4
+LIVE_RETRY_SECONDS = 5
+LIVE_REFRESH_SECONDS = 5
+SEARCH_LIMIT = 15
+HUD_PAGE_SIZE = 10
+MATCH_COLUMNS = ["id", "date", "map", "score_blue", "score_red"]
+LEADERBOARD_COLUMNS = [
+    "#", "name", "ranking_points", "kills", "assists", "deaths", "wins", "losses",
+    "kd", "winrate", "roundsWon", "roundsLost", "saldo", "form"
+]
 st.set_page_config(page_title="FPL Dashboard", layout="wide")
 
+@st.cache_resource
+def get_http():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@st.cache_resource
+def get_validator_cache():
+    # LRU: buscas por prefixo e páginas de histórico geram chaves sem fim
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
 if "is_admin" not in st.session_state:
     st.session_state["is_admin"] = False
 
 def login(username, password):
     try:
-        res = requests.post(f"{API_URL}/login", json={"username": username, "password": password})
+        res = get_http().post(f"{API_URL}/login", json={"username": username, "password": password})
         if res.status_code == 200:
             st.session_state["is_admin"] = True
             st.success("Login realizado com sucesso!")
@@ -34,30 +68,264 @@ else:
 
 tabs = st.tabs(tabs_labels)
 
-def get_players():
+def conditional_get(path, params=None):
+    cache = get_validator_cache()
+    key = (path, tuple(sorted((params or {}).items())))
+    with cache["lock"]:
+        cached = cache["entries"].get(key)
+        if cached:
+            cache["entries"].move_to_end(key)
+    headers = {}
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    res = get_http().get(f"{API_URL}{path}", params=params, headers=headers)
+    if res.status_code == 304 and cached:
+        return cached["data"]
+    res.raise_for_status()
+    data = res.json()
+    if res.headers.get("ETag"):
+        with cache["lock"]:
+            cache["entries"][key] = {
+                "etag": res.headers["ETag"],
+                "last_modified": res.headers.get("Last-Modified"),
+                "data": data
+            }
+            cache["entries"].move_to_end(key)
+            while len(cache["entries"]) > VALIDATOR_CACHE_SIZE:
+                cache["entries"].popitem(last=False)
+    return data
+
+@st.cache_resource
+def get_fetched():
+    # Argumentos de tudo que passou por fetch_json, para que um evento limpe
+    # só as entradas que ele afeta
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def remember_fetch(path, params):
+    fetched = get_fetched()
+    key = (path, tuple(sorted((params or {}).items())))
+    with fetched["lock"]:
+        fetched["entries"][key] = (path, params)
+        fetched["entries"].move_to_end(key)
+        while len(fetched["entries"]) > VALIDATOR_CACHE_SIZE:
+            fetched["entries"].popitem(last=False)
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=VALIDATOR_CACHE_SIZE, show_spinner=False)
+def fetch_json(path, params=None):
+    remember_fetch(path, params)
+    return conditional_get(path, params)
+
+def invalidate_cache():
+    fetched = get_fetched()
+    with fetched["lock"]:
+        fetched["entries"].clear()
+    fetch_json.clear()
+
+def event_touches(event, path, params):
+    kind = event.get("type")
+    names = set(event.get("players") or {})
+    names.update(n for n in (event.get("name"), event.get("old_name")) if n)
+    match_ids = set(event.get("match_ids") or [])
+    if event.get("match_id") is not None:
+        match_ids.add(event["match_id"])
+
+    if path == "/leaderboard":
+        return True
+    if path == "/stats/maps":
+        return bool(match_ids)
+    if path == "/players/search":
+        return kind in ("player_created", "player_renamed")
+    if path == "/matches":
+        # O HUD traz os nomes dos jogadores; partidas novas não estão em
+        # nenhuma página já buscada
+        if kind == "player_renamed":
+            return True
+        ids = {int(i) for i in str(params["ids"]).split(",") if i}
+        return kind in ("match_deleted", "stats_edited") and bool(ids & match_ids)
+    if path.startswith("/players/"):
+        return path.split("/")[2] in names
+    return True
+
+def apply_event(event):
+    # Só o ranking e as entradas dos jogadores/partidas do evento saem do
+    # cache; o resto continua valendo até o CACHE_TTL
+    if event.get("type") not in ("player_created", "player_renamed", "match_created",
+                                 "matches_created", "match_deleted", "stats_edited"):
+        invalidate_cache()
+        return
+    fetched = get_fetched()
+    with fetched["lock"]:
+        stale = [key for key, (path, params) in fetched["entries"].items() if event_touches(event, path, params)]
+        stale = [(key, fetched["entries"].pop(key)) for key in stale]
+    for _, (path, params) in stale:
+        if params is None:
+            fetch_json.clear(path)
+        else:
+            fetch_json.clear(path, params)
+
+@st.cache_resource
+def get_prefetch_pool():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+
+def prefetch_history(name):
     try:
-        res = requests.get(f"{API_URL}/players")
-        if res.status_code == 200:
-            return pd.DataFrame(res.json())
+        fetch_json(f"/players/{name}/matches", {"limit": HISTORY_PAGE_SIZE})
+    except Exception:
+        pass
+
+def prefetch_histories(names):
+    # Em segundo plano e sem esperar: o resto da página não fica parado
+    # atrás dessas requisições
+    pool = get_prefetch_pool()
+    for name in names:
+        pool.submit(prefetch_history, name)
+
+def read_events(lines):
+    data = []
+    for line in lines:
+        if line:
+            if line.startswith("data:"):
+                data.append(line[5:].strip())
+        elif data:
+            yield json.loads("\n".join(data))
+            data = []
+
+def watch_events():
+    # Escuta /events e limpa do cache as leituras que o evento afeta; o
+    # ranking em tela (leaderboard_table) se atualiza sozinho sem esperar o
+    # CACHE_TTL.
+    while True:
+        try:
+            with requests.get(f"{API_URL}/events", stream=True, timeout=(10, 60)) as res:
+                res.raise_for_status()
+                lines = res.iter_lines(decode_unicode=True)
+                # A primeira linha confirma a inscrição; o que mudou enquanto
+                # estava desconectado não pode continuar no cache.
+                next(lines)
+                invalidate_cache()
+                for event in read_events(lines):
+                    apply_event(event)
+        except Exception:
+            pass
+        time.sleep(LIVE_RETRY_SECONDS)
+
+@st.cache_resource
+def start_live_updates():
+    thread = threading.Thread(target=watch_events, daemon=True)
+    thread.start()
+    return thread
+
+def search_players(query, limit=SEARCH_LIMIT):
+    try:
+        data = fetch_json("/players/search", {"q": query, "limit": limit})
+        if isinstance(data, list):
+            return data
     except Exception as e:
         st.error("Erro ao buscar jogadores.")
         st.exception(e)
+    return []
+
+def player_picker(label, key):
+    query = st.text_input(f"Buscar — {label}", key=f"{key}_query", placeholder="Digite o início do nome")
+    return st.selectbox(label, search_players(query.strip()), key=key)
+
+def get_leaderboard(limit, offset, date_from=None):
+    try:
+        params = {"limit": limit, "offset": offset}
+        if date_from is not None:
+            params["from"] = date_from.isoformat()
+        data = fetch_json("/leaderboard", params)
+        if data is not None:
+            return pd.DataFrame(data.get("players", [])), data.get("total", 0)
+    except Exception as e:
+        st.error("Erro ao buscar ranking.")
+        st.exception(e)
+    return pd.DataFrame(), 0
+
+def get_matches(match_ids):
+    # Uma requisição para a página inteira do HUD
+    if not match_ids:
+        return []
+    try:
+        data = fetch_json("/matches", {"ids": ",".join(map(str, match_ids))})
+        if isinstance(data, list):
+            return data
+    except Exception as e:
+        st.error("Erro ao buscar HUD das partidas.")
+        st.exception(e)
+    return []
+
+@st.cache_resource
+def get_match_store():
+    return {"lock": threading.Lock(), "seq": 0, "matches": pd.DataFrame(columns=MATCH_COLUMNS)}
+
+def sync_matches():
+    # Mantém as partidas em memória e só baixa o que mudou desde o último seq
+    store = get_match_store()
+    with store["lock"]:
+        try:
+            while True:
+                res = get_http().get(f"{API_URL}/changes", params={"since": store["seq"]})
+                res.raise_for_status()
+                data = res.json()
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+
+                df_new = pd.DataFrame(data["matches"], columns=MATCH_COLUMNS)
+                df_new["date"] = pd.to_datetime(df_new["date"])
+                if data["reset"]:
+                    df = df_new
+                else:
+                    df = store["matches"]
+                    stale = df["id"].isin(data["deleted_matches"]) | df["id"].isin(df_new["id"])
+                    df = pd.concat([df[~stale], df_new], ignore_index=True) if not df_new.empty else df[~stale]
+                store["matches"] = df
+                store["seq"] = data["seq"]
+                if not data["more"]:
+                    break
+        except Exception as e:
+            st.error("Erro ao sincronizar partidas.")
+            st.exception(e)
+        return store["matches"].sort_values("id", ascending=False)
+
+def get_map_stats():
+    try:
+        data = fetch_json("/stats/maps")
+        if isinstance(data, list):
+            return pd.DataFrame(data)
+    except Exception as e:
+        st.error("Erro ao buscar estatísticas dos mapas.")
+        st.exception(e)
     return pd.DataFrame()
 
-def get_match(match_id):
+def get_player_maps(player_name):
     try:
-        res = requests.get(f"{API_URL}/matches/{match_id}")
-        if res.status_code == 200:
-            return res.json()
+        data = fetch_json(f"/players/{player_name}/maps")
+        if isinstance(data, list):
+            return pd.DataFrame(data)
+    except Exception as e:
+        st.error("Erro ao buscar mapas do jogador.")
+        st.exception(e)
+    return pd.DataFrame()
+
+def get_player_form(player_name, window=10):
+    try:
+        data = fetch_json(f"/players/{player_name}/form", {"window": window})
+        if data is not None and "error" not in data:
+            return data
     except Exception as e:
-        st.error("Erro ao buscar HUD da partida.")
+        st.error("Erro ao buscar forma do jogador.")
         st.exception(e)
     return None
 
 def create_player(name):
     try:
-        res = requests.post(f"{API_URL}/players", json={"name": name})
+        res = get_http().post(f"{API_URL}/players", json={"name": name})
         if res.status_code == 200:
+            invalidate_cache()
             st.success("Jogador cadastrado com sucesso!")
         else:
             st.warning(res.json().get("msg", "Erro desconhecido."))
@@ -67,8 +335,11 @@ def create_player(name):
 
 def create_match(payload):
     try:
-        res = requests.post(f"{API_URL}/matches", json=payload)
-        if res.status_code == 200:
+        res = get_http().post(f"{API_URL}/matches", json=payload)
+        if res.status_code == 200 and "ticket" in res.json():
+            st.success("Partida recebida! Ela aparecerá nas estatísticas em instantes.")
+        elif res.status_code == 200:
+            invalidate_cache()
             st.success("Partida cadastrada com sucesso!")
         else:
             st.error(res.json().get("error", "Erro ao salvar partida."))
@@ -76,20 +347,36 @@ def create_match(payload):
         st.error("Erro ao salvar partida.")
         st.exception(e)
 
-def get_player_matches(player_name):
+def get_player_matches(player_name, before=None, limit=HISTORY_PAGE_SIZE):
     try:
-        res = requests.get(f"{API_URL}/players/{player_name}/matches")
-        if res.status_code == 200:
-            return pd.DataFrame(res.json())
+        params = {"limit": limit}
+        if before is not None:
+            params["before_date"] = before["date"]
+            params["before_id"] = before["id"]
+        data = fetch_json(f"/players/{player_name}/matches", params)
+        if data is not None:
+            return pd.DataFrame(data.get("matches", [])), data.get("next_before")
     except Exception as e:
         st.error("Erro ao buscar partidas do jogador.")
         st.exception(e)
-    return pd.DataFrame()
+    return pd.DataFrame(), None
+
+def get_player_history(player_name, pages):
+    frames = []
+    before = None
+    for _ in range(pages):
+        df_page, before = get_player_matches(player_name, before)
+        frames.append(df_page)
+        if before is None:
+            break
+    df_history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return df_history, before is not None
 
 def update_player_name(old_name, new_name):
     try:
-        res = requests.put(f"{API_URL}/players/{old_name}", json={"name": new_name})
+        res = get_http().put(f"{API_URL}/players/{old_name}", json={"name": new_name})
         if res.status_code == 200:
+            invalidate_cache()
             st.success("Nome atualizado com sucesso!")
         else:
             st.error(res.json().get("error", "Erro ao atualizar nome."))
@@ -98,58 +385,110 @@ def update_player_name(old_name, new_name):
 
 def delete_match(match_id):
     try:
-        res = requests.delete(f"{API_URL}/matches/{match_id}?adjust_stats=true")
+        res = get_http().delete(f"{API_URL}/matches/{match_id}?adjust_stats=true")
         if res.status_code == 200:
+            invalidate_cache()
             st.success("Partida excluída com sucesso!")
         else:
             st.error(res.json().get("error", "Erro ao excluir partida."))
     except Exception as e:
         st.exception(e)
 
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def leaderboard_table(limit, offset, date_from):
+    # Reexecutado a cada poucos segundos só com o que está em cache; a API só
+    # é consultada de novo quando um evento de /events limpou o cache.
+    df, _ = get_leaderboard(limit, offset, date_from)
+    if not df.empty:
+        st.dataframe(df.rename(columns={"rank": "#"})[LEADERBOARD_COLUMNS])
+
 # Estatísticas (sempre visível)
 with tabs[0]:
+    start_live_updates()
     st.title("🏆 FPL Dashboard - Estatísticas de Jogadores e Partidas")
     st.subheader("📊 Estatísticas Gerais dos Jogadores (mínimo 3 partidas)")
-    df_players = get_players()
-    if not df_players.empty:
-        df_filtered = df_players[df_players["matches"] >= 3].copy()
-        df_filtered = df_filtered[["name", "matches", "wins", "losses", "kills", "deaths", "assists", "roundsWon", "roundsLost"]]
-
-        df_filtered["kd"] = (df_filtered["kills"] / df_filtered["deaths"]).round(2).fillna(0)
-        df_filtered["winrate"] = ((df_filtered["wins"] / df_filtered["matches"]) * 100).round(2)
-        df_filtered["saldo"] = df_filtered["roundsWon"] - df_filtered["roundsLost"]
-
-        df_filtered["ranking_points"] = (
-            (df_filtered["kills"] * 2) +
-            (df_filtered["assists"]) +
-            (df_filtered["wins"] * 7) +
-            (df_filtered["kd"] * 10) +
-            (df_filtered["winrate"] * 0.5) -
-            (df_filtered["deaths"] * 2) -
-            (df_filtered["losses"] * 7)
-        ).round(1)
-
-        df_filtered = df_filtered.sort_values(by="ranking_points", ascending=False).reset_index(drop=True)
-        df_filtered.insert(0, "#", df_filtered.index + 1)
-
-        df_filtered = df_filtered[[
-            "#", "name", "ranking_points", "kills", "assists", "deaths", "wins", "losses",
-            "kd", "winrate", "roundsWon", "roundsLost", "saldo"
-        ]]
+    periods = {
+        "Todo o período": None,
+        "Últimos 30 dias": date.today() - timedelta(days=30),
+        "Este mês": date.today().replace(day=1),
+    }
+    period = st.radio("Período", list(periods), horizontal=True)
+    page_size = 50
+    # Cada período tem sua página; se o ranking encolheu, volta para a última válida
+    page_key = f"leaderboard_page_{period}"
+    page = st.session_state.get(page_key, 1)
+    df_filtered, total_ranked = get_leaderboard(page_size, (page - 1) * page_size, periods[period])
+    total_pages = max(1, -(-total_ranked // page_size))
+    if page > total_pages:
+        page = st.session_state[page_key] = total_pages
+        df_filtered, total_ranked = get_leaderboard(page_size, (page - 1) * page_size, periods[period])
+    if not df_filtered.empty:
+        if total_pages > 1:
+            st.number_input("Página", min_value=1, max_value=total_pages, step=1, key=page_key)
 
         selected_player = st.selectbox("Clique para ver histórico de um jogador", df_filtered["name"].tolist())
-        st.dataframe(df_filtered)
+        leaderboard_table(page_size, (page - 1) * page_size, periods[period])
 
         if selected_player:
+            player_form = get_player_form(selected_player)
+            if player_form and player_form["matches"]:
+                st.markdown(f"### Forma recente de {selected_player}")
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric(f"Últimas {player_form['matches']}", player_form["form"])
+                col2.metric("Sequência atual", f"{abs(player_form['current_streak'])} {'vitórias' if player_form['current_streak'] > 0 else 'derrotas'}")
+                col3.metric("Maior sequência de vitórias", player_form["best_win_streak"])
+                col4.metric("Maior sequência com K/D ≥ 1", player_form["best_kd_streak"])
+
             st.markdown(f"### Histórico de partidas de {selected_player}")
-            df_history = get_player_matches(selected_player)
+            if st.session_state.get("history_player") != selected_player:
+                st.session_state["history_player"] = selected_player
+                st.session_state["history_pages"] = 1
+            df_history, has_more = get_player_history(selected_player, st.session_state["history_pages"])
             if not df_history.empty:
                 st.dataframe(df_history)
+                if has_more and st.button("Carregar mais partidas"):
+                    st.session_state["history_pages"] += 1
+                    st.rerun()
             else:
                 st.info("Esse jogador ainda não possui partidas registradas.")
+
+            df_player_maps = get_player_maps(selected_player)
+            if not df_player_maps.empty:
+                st.markdown(f"### Desempenho por mapa de {selected_player}")
+                st.dataframe(df_player_maps)
+
+        # Pré-carrega o histórico dos primeiros colocados para trocas rápidas no selectbox
+        prefetch_histories(df_filtered["name"].head(PREFETCH_PLAYERS).tolist())
     else:
         st.info("Nenhum jogador com 3 partidas encontradas.")
 
+    st.subheader("🗺️ Estatísticas por mapa")
+    df_maps = get_map_stats()
+    if not df_maps.empty:
+        st.dataframe(df_maps)
+    else:
+        st.info("Nenhuma partida registrada.")
+
+    st.subheader("📜 Partidas")
+    df_matches = sync_matches()
+    if not df_matches.empty:
+        st.dataframe(df_matches, hide_index=True)
+
+        st.subheader("🎮 HUD das partidas")
+        hud_pages = max(1, -(-len(df_matches) // HUD_PAGE_SIZE))
+        hud_page = st.number_input("Página do HUD", min_value=1, max_value=hud_pages, value=1, step=1)
+        page_ids = df_matches["id"].iloc[(hud_page - 1) * HUD_PAGE_SIZE:hud_page * HUD_PAGE_SIZE].tolist()
+        for match in get_matches(page_ids):
+            with st.expander(f"#{match['id']} — {match['map']} — Azul {match['score']['blue']} x {match['score']['red']} Vermelho"):
+                df_board = pd.DataFrame(match["players"])
+                col_blue, col_red = st.columns(2)
+                for col, team, label in [(col_blue, "blue", "🔵 Time Azul"), (col_red, "red", "🔴 Time Vermelho")]:
+                    col.markdown(f"**{label}**")
+                    if not df_board.empty:
+                        col.dataframe(df_board[df_board["team"] == team].drop(columns="team"), hide_index=True)
+    else:
+        st.info("Nenhuma partida registrada.")
+
 # Administração (apenas se logado)
 if st.session_state["is_admin"] and len(tabs) > 1:
     with tabs[1]:
@@ -163,12 +502,11 @@ if st.session_state["is_admin"] and len(tabs) > 1:
                 create_player(name)
 
         st.subheader("🔁 Atualizar nome do jogador")
-        if not df_players.empty:
-            old_name = st.selectbox("Selecione o nome atual", df_players["name"].tolist(), key="old_name")
-            new_name = st.text_input("Novo nome", key="new_name")
-            if st.button("Atualizar nome"):
-                if old_name and new_name:
-                    update_player_name(old_name, new_name)
+        old_name = player_picker("Selecione o nome atual", "old_name")
+        new_name = st.text_input("Novo nome", key="new_name")
+        if st.button("Atualizar nome"):
+            if old_name and new_name:
+                update_player_name(old_name, new_name)
 
         st.subheader("🗑️ Excluir partida")
         match_id_to_delete = st.number_input("ID da partida a ser excluída", min_value=1, step=1, key="delete_match")
@@ -176,7 +514,8 @@ if st.session_state["is_admin"] and len(tabs) > 1:
             delete_match(match_id_to_delete)
 
         st.subheader("📝 Adicionar nova partida")
-        with st.form("create_match_form"):
+        # Fora de st.form: a busca de jogadores precisa de rerun a cada digitação
+        with st.container(border=True):
             map_selected = st.selectbox("Mapa", [
                 "Café Dostoyevsky", "Consulado", "Clube", "Fronteira", "Litoral", "Chalé",
                 "Covil", "Laboratórios Nighthaven", "Planíce Esmeralda", "Banco", "Canal",
@@ -185,12 +524,11 @@ if st.session_state["is_admin"] and len(tabs) > 1:
             score_blue = st.number_input("Placar Time Azul", 0, 8, step=1)
             score_red = st.number_input("Placar Time Vermelho", 0, 8, step=1)
 
-            known_players = df_players["name"].tolist() if not df_players.empty else []
             players_data = []
             st.markdown("**Selecione os 10 jogadores da partida**")
             for i in range(10):
                 with st.expander(f"Jogador {i+1}"):
-                    player_name = st.selectbox(f"Nome do jogador {i+1}", options=known_players, key=f"player_{i}_name")
+                    player_name = player_picker(f"Nome do jogador {i+1}", f"player_{i}_name")
                     team = "blue" if i < 5 else "red"
                     st.text(f"Time: {team.capitalize()}")
                     kills = st.number_input(f"Kills", 0, 50, key=f"kills_{i}")
@@ -204,7 +542,7 @@ if st.session_state["is_admin"] and len(tabs) > 1:
                         "assists": assists
                     })
 
-            submit_match = st.form_submit_button("Registrar partida")
+            submit_match = st.button("Registrar partida")
             if submit_match:
                 payload = {
                     "map": map_selected,